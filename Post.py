@@ -10,6 +10,7 @@ from app.create_video_script import create_video_script
 from app.get_trends import get_trends
 from app.generate_video import generate_video
 from app.upload_video import upload_video
+from app.render_poller import poll_render, RenderTimeout
 import asyncio
 
 
@@ -34,11 +35,14 @@ d_id_client = DIdClient(api_key=D_ID_API_KEY)
 
 
 
-async def check_video_status_async(d_id_client, talk_id):
+async def check_video_status_async(d_id_client, talk_id, script_length=0):
     with st.spinner("Video is being processed..."):
-        while not d_id_client.is_video_ready(talk_id):
-            await asyncio.sleep(10)
-    return d_id_client.get_video_url(talk_id)
+        # The status call is a blocking request, keep it off the event loop
+        fetch_status = lambda: asyncio.to_thread(d_id_client.get_talk_status, talk_id)
+        try:
+            return await poll_render(fetch_status, "D-ID", script_length)
+        except RenderTimeout:
+            return None
 
     
 
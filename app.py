@@ -1,55 +1,21 @@
 import streamlit as st
-import mysql.connector
-from mysql.connector import Error
-import os
-from urllib.parse import urlparse
-from app.create_video_script import create_video_script
-from app.generate_video import generate_video
+from app.db import DatabaseError
+from app.auth import login, validate_session_token, revoke_session_token
+from app.create_video_script import stream_video_script
+from app.generate_video import submit_video, render_jobs_panel
 from app.get_trends import get_trends
 from app.upload_video import upload_video
-from app.influencer import generate_influencer_profile, generate_influencer_content, generate_influencer_image
-
-def create_connection():
-    try:
-        jawsdb_url = os.getenv("JAWSDB_URL")
-        if not jawsdb_url:
-            st.error("JawsDB URL not found in environment variables.")
-            return None
-
-        parsed_url = urlparse(jawsdb_url)
-        username = parsed_url.username
-        password = parsed_url.password
-        hostname = parsed_url.hostname
-        port = parsed_url.port
-        database = parsed_url.path.lstrip('/')
-
-        connection = mysql.connector.connect(
-            host=hostname,
-            port=port,
-            user=username,
-            password=password,
-            database=database
-        )
-        return connection
-    except Error as e:
-        st.error(f"Error connecting to JawsDB MySQL: {e}")
-        return None
-
-
-def authenticate_user(username, password):
-    connection = create_connection()
-    if connection:
-        try:
-            cursor = connection.cursor()
-            query = "SELECT * FROM users WHERE username = %s AND password = %s"
-            cursor.execute(query, (username, password))
-            result = cursor.fetchone()
-            cursor.close()
-            connection.close()
-            return result is not None
-        except Error as e:
-            st.error(f"Error authenticating user: {e}")
-    return False
+from app.influencer import stream_influencer_profile, generate_influencer_content, generate_influencer_image, image_store
+
+# Render streamed tokens into a placeholder as they arrive, returns the full text
+def render_stream(tokens):
+    placeholder = st.empty()
+    text = ""
+    for token in tokens:
+        text += token
+        placeholder.markdown(text + "▌")
+    placeholder.empty()
+    return text
 
 
 def navigate():
@@ -71,13 +37,21 @@ def login_register_page():
     login_username = st.text_input("Username", key="login_username")
     login_password = st.text_input("Password", type="password", key="login_password")
     if st.button("Login"):
-        if authenticate_user(login_username, login_password):
-            st.session_state.logged_in = True
-            st.session_state.username = login_username
-            st.success("Logged in successfully!")
-            st.experimental_rerun()
+        try:
+            # The only point the users table is read, every later page load checks the token instead
+            token = login(login_username, login_password)
+        except DatabaseError as e:
+            st.error(f"Error authenticating user: {e}")
         else:
-            st.error("Invalid username or password.")
+            if token:
+                # Only ever kept in the session, a token in the URL would leak into history and logs
+                st.session_state.session_token = token
+                st.session_state.logged_in = True
+                st.session_state.username = login_username
+                st.success("Logged in successfully!")
+                st.experimental_rerun()
+            else:
+                st.error("Invalid username or password.")
 
     st.header("New User?")
     st.write("To register, please click the button below:")
@@ -94,10 +68,11 @@ def home_page():
 def get_trends_page():
     st.header("Discover Trends")
     query = st.text_input("Enter a topic to search trends:")
-    source = st.radio("Select trend source:", options=["Twitter", "GPT"], index=1)
+    source = st.radio("Select trend source:", options=["Twitter", "GPT", "All"], index=1)
 
     if st.button("Find Trends"):
         if query.strip():
+            st.session_state['trend_engine'] = source
             trends = get_trends(query, st.session_state)
             st.write("Here are the top trends:")
             for trend in trends:
@@ -111,7 +86,7 @@ def create_video_script_page():
     topic = st.text_input("Enter a topic for the video:")
     if st.button("Generate Script"):
         if topic.strip():
-            script = create_video_script(topic)
+            script = render_stream(stream_video_script(topic))
             st.text_area("Generated Script", script, height=200)
         else:
             st.warning("Please enter a topic to generate a script.")
@@ -123,14 +98,11 @@ def generate_video_page():
     source_url = st.text_input("Enter a source video URL:")
     if st.button("Generate Video"):
         if edited_script.strip() and source_url.strip():
-            video_url = generate_video(edited_script, source_url)
-            if video_url:
-                st.success("Video generated successfully!")
-                st.video(video_url)
-            else:
-                st.error("Failed to generate the video.")
+            submit_video(edited_script, source_url)
+            st.success("Video queued. You can keep working while it renders.")
         else:
             st.warning("Please provide a script and a source URL to generate a video.")
+    render_jobs_panel()
 
 
 def upload_video_page():
@@ -149,8 +121,8 @@ def virtual_influencer_page():
     personality = st.text_input("Personality", "Adventurous and creative")
     interests = st.text_input("Interests", "Technology, fashion, and mental health awareness")
     if st.button("Generate Profile"):
-        profile = generate_influencer_profile(name, personality, interests)
         st.subheader("Generated Profile:")
+        profile = render_stream(stream_influencer_profile(name, personality, interests))
         st.text_area("Profile", profile, height=150)
 
     st.subheader("Step 2: Generate Influencer Posts")
@@ -165,16 +137,26 @@ def virtual_influencer_page():
     description = st.text_input("Image Description", "A young, stylish influencer with a bright smile wearing trendy clothes")
     style = st.selectbox("Image Style", ["Realistic", "Cartoon", "Abstract"])
     if st.button("Generate Image"):
-        image_url = generate_influencer_image(description, style)
+        image_path = generate_influencer_image(description, style)
         st.subheader("Generated Image:")
-        if "Error" not in image_url:
-            st.image(image_url, caption="Generated Influencer Image", use_column_width=True)
+        if "Error" not in image_path:
+            st.image(image_store.thumbnail_for(image_path), caption="Generated Influencer Image", use_column_width=True)
         else:
-            st.error(image_url)
+            st.error(image_path)
+
+
+# Function to check this session's token, which expires or is revoked on logout
+def current_user():
+    token = st.session_state.get("session_token")
+    username = validate_session_token(token)
+    st.session_state.session_token = token if username else None
+    st.session_state.logged_in = username is not None
+    st.session_state.username = username
+    return username
 
 
 # Main App Logic
-if "logged_in" not in st.session_state or not st.session_state.logged_in:
+if current_user() is None:
     login_register_page()
 else:
     page = navigate()
@@ -191,6 +173,8 @@ else:
     elif page == "Virtual Influencer":
         virtual_influencer_page()
     elif page == "Logout":
+        revoke_session_token(st.session_state.session_token)
+        st.session_state.session_token = None
         st.session_state.logged_in = False
         st.session_state.username = None
         st.success("Logged out successfully!")
@@ -0,0 +1,148 @@
+# Login against the users table once, then signed session tokens checked in memory on every page load
+import base64
+import hashlib
+import hmac
+import logging
+import os
+import secrets
+import threading
+import time
+
+from app.db import db_connection
+
+# Key session tokens are signed with. Without one, tokens only last as long as the process.
+SESSION_SECRET = os.getenv("SESSION_SECRET", "")
+SESSION_TTL = int(os.getenv("SESSION_TTL", str(12 * 60 * 60)))
+
+# Validated tokens kept in memory at most
+MAX_CACHED_SESSIONS = 10000
+
+if not SESSION_SECRET:
+    logging.warning("SESSION_SECRET is not set, sessions won't survive a restart")
+    SESSION_SECRET = secrets.token_hex(32)
+
+
+def hash_password(password):
+    return hashlib.sha256(password.encode()).hexdigest()
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def _sign(payload):
+    return _b64encode(hmac.new(SESSION_SECRET.encode(), payload.encode(), hashlib.sha256).digest())
+
+
+# Function to check a username and password against the users table, returns True if they match
+def verify_credentials(username, password):
+    # Read-only: the lookup relies on the index from migrations/001_users_username_index.sql, and
+    # passwords stored before hashing were converted by migrations/005_hash_legacy_passwords.sql
+    with db_connection() as connection:
+        cursor = connection.cursor()
+        try:
+            # Only the stored hash is needed, not the whole row
+            cursor.execute("SELECT password FROM users WHERE username = %s LIMIT 1", (username,))
+            row = cursor.fetchone()
+            if row is None:
+                return False
+            return hmac.compare_digest((row[0] or "").encode(), hash_password(password).encode())
+        finally:
+            cursor.close()
+
+
+# Validated sessions by token, so page loads never touch the database
+class SessionCache:
+    def __init__(self, max_entries=MAX_CACHED_SESSIONS):
+        self.max_entries = max_entries
+        self._sessions = {}
+        self._revoked = {}
+        self._lock = threading.Lock()
+
+    def _prune(self, now):
+        for cache in (self._sessions, self._revoked):
+            for token in [t for t, entry in cache.items() if entry[1] <= now]:
+                del cache[token]
+
+    def get(self, token):
+        now = time.time()
+        with self._lock:
+            entry = self._sessions.get(token)
+            if entry is None or entry[1] <= now:
+                return None
+            return entry[0]
+
+    def set(self, token, username, expires_at):
+        now = time.time()
+        with self._lock:
+            if token in self._revoked:
+                return
+            if len(self._sessions) >= self.max_entries:
+                self._prune(now)
+            if len(self._sessions) < self.max_entries:
+                self._sessions[token] = (username, expires_at)
+
+    def revoke(self, token, expires_at):
+        with self._lock:
+            self._sessions.pop(token, None)
+            self._revoked[token] = (None, expires_at)
+            if len(self._revoked) > self.max_entries:
+                self._prune(time.time())
+
+    def is_revoked(self, token):
+        with self._lock:
+            return token in self._revoked
+
+
+session_cache = SessionCache()
+
+
+# Function to issue a signed token for a user who just logged in
+def issue_session_token(username, ttl=SESSION_TTL):
+    expires_at = int(time.time() + ttl)
+    payload = f"{_b64encode(username.encode())}.{expires_at}.{secrets.token_hex(8)}"
+    token = f"{payload}.{_sign(payload)}"
+    session_cache.set(token, username, expires_at)
+    return token
+
+
+# Function to check a session token, returns its username or None if it's invalid, expired or revoked
+def validate_session_token(token):
+    if not token:
+        return None
+    username = session_cache.get(token)
+    if username is not None:
+        return username
+    try:
+        encoded_username, expires_at, nonce, signature = token.split(".")
+        payload = f"{encoded_username}.{expires_at}.{nonce}"
+        if not hmac.compare_digest(signature, _sign(payload)) or int(expires_at) <= time.time():
+            return None
+        username = _b64decode(encoded_username).decode()
+    except (TypeError, ValueError):
+        return None
+    if session_cache.is_revoked(token):
+        return None
+    session_cache.set(token, username, int(expires_at))
+    return username
+
+
+# Function to end a session. Revocation is per process, other processes honour the token until it expires.
+def revoke_session_token(token):
+    try:
+        expires_at = int(token.split(".")[1])
+    except (AttributeError, IndexError, ValueError):
+        return
+    session_cache.revoke(token, expires_at)
+
+
+# Function to log in: verify the password once, returns a session token or None.
+# Raises DatabaseError if the users table can't be reached.
+def login(username, password):
+    if verify_credentials(username, password):
+        return issue_session_token(username)
+    return None
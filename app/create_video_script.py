@@ -1,18 +1,59 @@
+import asyncio
+import logging
+import os
 import openai
-import streamlit as st
+from dotenv import load_dotenv
+from app.openai_stream import stream_chat
 
-# Authenticate OpenAI API
-openai.api_key = st.session_state.get('YOUR_OPENAI_API_KEY', '')
+# Authenticate OpenAI API, from the environment so scripts can be written outside Streamlit too
+load_dotenv()
+openai.api_key = os.getenv('YOUR_OPENAI_API_KEY', '')
 
-# generate video script with openai gpt api 
-def create_video_script(topic):
+# How many script requests a batch keeps in flight at once
+MAX_CONCURRENT_SCRIPTS = 10
 
-    completion = openai.ChatCompletion.create(
-    model="gpt-3.5-turbo",
-    messages=[
+def script_messages(topic):
+    return [
         {"role": "system", "content": "You are a helpful assistant."},
         {"role": "user", "content": f"create a viral shortform video skript for a talking head about: {topic}. Give just the script to say, no meta desciption or anything else."}
     ]
+
+# generate video script with openai gpt api
+def create_video_script(topic):
+
+    completion = openai.ChatCompletion.create(
+    model="gpt-3.5-turbo",
+    messages=script_messages(topic)
     )
     script = completion.choices[0].message.get("content")
     return script
+
+# stream the video script token by token
+def stream_video_script(topic):
+    return stream_chat(script_messages(topic), label=f"Script for '{topic}'")
+
+# async version of create_video_script for batches
+async def acreate_video_script(topic):
+    completion = await openai.ChatCompletion.acreate(
+        model="gpt-3.5-turbo",
+        messages=script_messages(topic)
+    )
+    return completion.choices[0].message.get("content")
+
+async def _create_video_scripts(topics, max_concurrency):
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run(topic):
+        async with semaphore:
+            try:
+                return {"topic": topic, "script": await acreate_video_script(topic), "error": None}
+            except Exception as e:
+                logging.warning(f"Script generation failed for '{topic}': {e}")
+                return {"topic": topic, "script": None, "error": str(e)}
+
+    # gather keeps results in input order
+    return await asyncio.gather(*(run(topic) for topic in topics))
+
+# generate scripts for many topics concurrently, one result dict per topic in input order
+def create_video_scripts(topics, max_concurrency=MAX_CONCURRENT_SCRIPTS):
+    return asyncio.run(_create_video_scripts(list(topics), max_concurrency))
@@ -1,10 +1,8 @@
-
+from flask import Flask, request, jsonify
 import stripe
 import os
-import mysql.connector
-from mysql.connector import Error
-from urllib.parse import urlparse
 import hashlib  # For password hashing
+from app.db import db_connection, DatabaseError
 
 app = Flask(__name__)
 stripe.api_key = os.getenv("STRIPE_SECRET_KEY")
@@ -13,47 +11,18 @@ stripe.api_key = os.getenv("STRIPE_SECRET_KEY")
 def hash_password(password):
     return hashlib.sha256(password.encode()).hexdigest()
 
-# Function to parse JawsDB URL and create a connection
-def create_connection():
-    try:
-        jawsdb_url = os.getenv("JAWSDB_URL")
-        if not jawsdb_url:
-            print("JawsDB URL not found in environment variables.")
-            return None
-
-        parsed_url = urlparse(jawsdb_url)
-        username = parsed_url.username
-        password = parsed_url.password
-        hostname = parsed_url.hostname
-        port = parsed_url.port
-        database = parsed_url.path.lstrip('/')
-
-        connection = mysql.connector.connect(
-            host=hostname,
-            port=port,
-            user=username,
-            password=password,
-            database=database
-        )
-        return connection
-    except Error as e:
-        print(f"Error connecting to JawsDB MySQL: {e}")
-        return None
-
 # Function to register new users
 def register_user(username, password):
-    connection = create_connection()
-    if connection:
-        try:
+    try:
+        with db_connection() as connection:
             cursor = connection.cursor()
             query = "INSERT INTO users (username, password) VALUES (%s, %s)"
             cursor.execute(query, (username, hash_password(password)))
             connection.commit()
             cursor.close()
-            connection.close()
             return True
-        except Error as e:
-            print(f"Error registering user: {e}")
+    except DatabaseError as e:
+        print(f"Error registering user: {e}")
     return False
 
 @app.route("/webhook", methods=["POST"])
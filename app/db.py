@@ -0,0 +1,161 @@
+# Shared MySQL connection pool, one per process, reused across Streamlit sessions and webhook requests
+import collections
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+from app.stats import percentile
+
+# Connections the pool keeps open at most, and how long (seconds) a caller waits for a free one
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+
+# A connection idle for longer than this (seconds) is pinged before it's handed out
+HEALTH_CHECK_INTERVAL = 30
+
+# How many recent pool waits the metrics are computed over
+WAIT_SAMPLES = 1000
+
+
+class DatabaseError(Exception):
+    pass
+
+
+# Function to read the connection settings from JAWSDB_URL, or None if it isn't set
+def connection_settings(url=None):
+    url = url or os.getenv("JAWSDB_URL")
+    if not url:
+        return None
+    parsed_url = urlparse(url)
+    return {
+        "host": parsed_url.hostname,
+        "port": parsed_url.port,
+        "user": parsed_url.username,
+        "password": parsed_url.password,
+        "database": parsed_url.path.lstrip("/"),
+        # Pooled connections outlive a request, so don't let one hold a stale transaction snapshot
+        "autocommit": True,
+    }
+
+
+class ConnectionPool:
+    def __init__(self, settings, size=DB_POOL_SIZE, timeout=DB_POOL_TIMEOUT):
+        self.settings = settings
+        self.size = size
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(size)
+        # (connection, last used) pairs, most recently used last
+        self._idle = collections.deque()
+        self._lock = threading.Lock()
+        self._waits = collections.deque(maxlen=WAIT_SAMPLES)
+        self._counts = {"checkouts": 0, "timeouts": 0, "opened": 0, "health_checks": 0, "discarded": 0}
+
+    def _count(self, name):
+        with self._lock:
+            self._counts[name] += 1
+
+    def _open(self):
+        # mysql.connector is only imported once a connection is actually needed
+        import mysql.connector
+
+        connection = mysql.connector.connect(**self.settings)
+        self._count("opened")
+        return connection
+
+    # Function to check out a connection, waiting up to the pool timeout for one to free up
+    def acquire(self):
+        started = time.monotonic()
+        if not self._slots.acquire(timeout=self.timeout):
+            self._count("timeouts")
+            raise DatabaseError(f"No database connection free after {self.timeout:g}s (pool size {self.size})")
+        with self._lock:
+            self._waits.append(time.monotonic() - started)
+            self._counts["checkouts"] += 1
+            connection, last_used = self._idle.pop() if self._idle else (None, None)
+        try:
+            if connection is None:
+                return self._open()
+            if time.monotonic() - last_used > HEALTH_CHECK_INTERVAL:
+                # The server may have dropped it while idle, reconnect once if so
+                self._count("health_checks")
+                connection.ping(reconnect=True, attempts=1, delay=0)
+            return connection
+        except Exception as e:
+            self._slots.release()
+            raise DatabaseError(f"Error connecting to JawsDB MySQL: {e}") from e
+
+    # Function to return a connection, closing it instead if it broke while checked out
+    def release(self, connection, broken=False):
+        try:
+            if broken:
+                self._count("discarded")
+                try:
+                    connection.close()
+                except Exception:
+                    pass
+            else:
+                with self._lock:
+                    self._idle.append((connection, time.monotonic()))
+        finally:
+            self._slots.release()
+
+    # Function to use a pooled connection for the length of a with block
+    @contextmanager
+    def connection(self):
+        connection = self.acquire()
+        try:
+            yield connection
+        except Exception as e:
+            import mysql.connector
+
+            # A failed query usually leaves the connection usable, only drop it if it's gone
+            try:
+                broken = not connection.is_connected()
+            except Exception:
+                broken = True
+            self.release(connection, broken=broken)
+            # Only database errors become DatabaseError, bugs in the caller surface as themselves
+            if isinstance(e, mysql.connector.Error):
+                raise DatabaseError(str(e)) from e
+            raise
+        else:
+            self.release(connection)
+
+    def metrics(self):
+        with self._lock:
+            waits = list(self._waits)
+            idle = len(self._idle)
+            counts = dict(self._counts)
+        return dict(
+            counts,
+            size=self.size,
+            idle=idle,
+            wait_mean=sum(waits) / len(waits) if waits else 0.0,
+            wait_p95=percentile(waits, 0.95) or 0.0,
+            wait_max=max(waits, default=0.0),
+        )
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+# Function to get the process-wide pool, raises DatabaseError if JAWSDB_URL isn't set
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            settings = connection_settings()
+            if settings is None:
+                raise DatabaseError("JawsDB URL not found in environment variables.")
+            _pool = ConnectionPool(settings)
+            logging.info(f"Opened database pool with up to {_pool.size} connections")
+        return _pool
+
+
+# Function to use a connection from the shared pool
+def db_connection():
+    return get_pool().connection()
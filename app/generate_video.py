@@ -1,9 +1,10 @@
-import streamlit as st
-import asyncio
-from datetime import datetime
 from clients.d_id import DIdClient
-from clients.heygen import create_heygen_video
+from app.job_store import RenderJobStore
+from app.render_jobs import get_render_manager, DONE, FAILED
+from app.video_engines import DIdEngine, HeyGenEngine, EngineRouter
 import os
+import logging
+import threading
 from dotenv import load_dotenv
 
 # Load environment variables from the .env file
@@ -12,60 +13,115 @@ load_dotenv()
 # Fetch API key from environment variables
 d_id_api_key = os.getenv('D_ID_API_KEY')
 
-# Initialize DIdClient with the API key from environment variable
-d_id_client = DIdClient(api_key=d_id_api_key)
+# Completion callbacks from the webhook service land here
+render_job_store = RenderJobStore()
 
-async def check_video_status_async(d_id_client, talk_id, timeout=600):
-    start_time = datetime.now()
-    with st.spinner("Video is being processed..."):
-        while not d_id_client.is_video_ready(talk_id):
-            # Check if the timeout has been reached
-            if (datetime.now() - start_time).seconds > timeout:
-                st.error("Video processing timed out.")
-                return None
-            await asyncio.sleep(30)  # Increase the interval to reduce requests
-    return d_id_client.get_video_url(talk_id)
+_video_router = None
+_render_manager = None
+_video_lock = threading.Lock()
+
+# Function to get the router with every engine behind it, which picks the fastest healthy one and fails over.
+# Built on first use, so importing this module doesn't create API clients.
+def get_video_router():
+    global _video_router
+    with _video_lock:
+        if _video_router is None:
+            _video_router = EngineRouter(
+                [
+                    DIdEngine(DIdClient(api_key=d_id_api_key)),
+                    HeyGenEngine(os.getenv('HEYGEN_API_KEY', ''), os.getenv('YOUR_AVATAR_ID')),
+                ],
+                render_job_store
+            )
+        return _video_router
+
+# Function to get the job manager for the whole process, shared by every session.
+# The first call also picks up renders that were still running when the process last stopped.
+def get_video_render_manager():
+    global _render_manager
+    video_router = get_video_router()
+    with _video_lock:
+        if _render_manager is not None:
+            return _render_manager
+        _render_manager = get_render_manager(video_router.render)
+    resume_unfinished_renders(video_router, _render_manager)
+    return _render_manager
+
+# Function to pick up unfinished renders, waiting on each recorded job rather than submitting it again
+def resume_unfinished_renders(video_router, render_manager):
+    resumed = 0
+    for job in render_job_store.unfinished():
+        resume = lambda script, source_url, engine, report, job_id=job["job_id"]: video_router.resume(engine, job_id, script, report)
+        render_manager.submit(job["engine"], job["script"], job["source"], render=resume)
+        resumed += 1
+    if resumed:
+        logging.info(f"Resumed {resumed} unfinished renders")
+
+def selected_video_engine():
+    # Only the Streamlit views load the UI framework, so headless runs (batch.py, scheduler_worker.py) never do
+    import streamlit as st
 
-def generate_video(edited_script, file_path):
-    # Initialization
     if 'video_engine' not in st.session_state:
         st.session_state['video_engine'] = 'D-ID'
-    video_engine_choice = st.session_state['video_engine']
+    return st.session_state['video_engine']
+
+# Function to queue a render for this session, returns the job id without waiting
+def submit_video(edited_script, file_path):
+    import streamlit as st
+
+    job_id = get_video_render_manager().submit(selected_video_engine(), edited_script, file_path)
+    st.session_state.setdefault('render_jobs', []).append(job_id)
+    return job_id
+
+# Function to show this session's renders and their progress
+def render_jobs_panel():
+    import streamlit as st
+
+    # Also starts the manager, resuming renders left over from the last run
+    render_manager = get_video_render_manager()
+    job_ids = st.session_state.get('render_jobs', [])
+    if not job_ids:
+        return
+    st.subheader("Your Renders")
+    st.button("Refresh")
+    for job_id in reversed(job_ids):
+        job = render_manager.get(job_id)
+        if job is None:
+            continue
+        st.write(f"**{job['engine']}** render `{job_id[:8]}`: {job['state']}")
+        if job["state"] == DONE:
+            st.video(job["video_url"])
+        elif job["state"] == FAILED:
+            st.error(job["error"])
+        else:
+            st.progress(job["progress"])
+
+def generate_video(edited_script, file_path):
+    import streamlit as st
+
+    video_engine_choice = selected_video_engine()
 
     # Log the video generation engine
     st.write(f"Generating Video with {video_engine_choice}...")
 
-    # Decide which video engine to use
-    if video_engine_choice == "Heygen":
-        video_url = create_heygen_video(edited_script)
-        if video_url:
-            st.write(f"Video created successfully! [Watch here]({video_url})")
-        else:
-            st.error("Failed to create video.")
+    # Render on the job manager and wait for it here
+    job_id = submit_video(edited_script, file_path)
+    render_manager = get_video_render_manager()
+    with st.spinner("Video is being processed..."):
+        video_url = render_manager.wait(job_id)
+    if video_url:
+        st.write(f"Video created with {render_manager.get(job_id)['engine']}. URL: {video_url}")
+        # Preview the video
+        st.video(video_url)
     else:
-        st.write("Video Generation with D-ID")
-
-        # Create a talk for D-ID video generation
-        talk = d_id_client.create_talk(file_path, edited_script)
-        talk_id = talk.get("id")
-        if not talk_id:
-            st.error("Failed to create talk. No valid Talk ID returned.")
-            return None  # Stop execution if talk ID is None
-        print(f"Talk ID: {talk_id}")
-
-        # Check if the video is ready with timeout
-        video_url = asyncio.run(check_video_status_async(d_id_client, talk_id, timeout=600))
-        if video_url:
-            st.write(f"Video URL: {video_url}")
-            # Preview the video
-            st.video(video_url)
-        else:
-            st.error("Failed to create video.")
+        st.error("Failed to create video.")
 
     return video_url
 
 # Example usage
 if __name__ == "__main__":
+    import streamlit as st
+
     st.title("Video/Image Generation Tool")
     edited_script = st.text_area("Enter the script for the video:")
 
@@ -1,23 +1,67 @@
-import streamlit as st
 import openai
-import tweepy
+import requests
 from dotenv import load_dotenv
 import os
+import logging
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from app.trend_cache import TrendCache, normalize_topic
+from app.tweet_stream import SlidingWindowCounter, ingest_tweets, rank_trends, latest_tweet_texts
+from app.twitter_budget import RateLimitBudget, TopicCursorStore
 
 # Load environment variables from .env file
 load_dotenv()
 
 # Authenticate Twitter API
 bearer_token = os.getenv('TWITTER_BEARER_TOKEN', 'your-twitter-bearer-token')
-twitter_client = tweepy.Client(bearer_token)
+_twitter_client = None
+_twitter_client_lock = threading.Lock()
+
+# Function to get the Twitter client, built on first use so importing this module doesn't load tweepy
+def get_twitter_client():
+    global _twitter_client
+    with _twitter_client_lock:
+        if _twitter_client is None:
+            import tweepy
+            # Raw responses so the rate-limit headers can be budgeted
+            _twitter_client = tweepy.Client(bearer_token, return_type=requests.Response)
+        return _twitter_client
 
 # Authenticate OpenAI API
 openai.api_key = os.getenv('YOUR_OPENAI_API_KEY', '')
 
+# Shared trend cache so repeat lookups skip Twitter and OpenAI
+trend_cache = TrendCache()
+
+# Sources queried by the "All" trend engine and how long each one may take (seconds)
+TREND_SOURCES = ["Twitter", "GPT"]
+SOURCE_DEADLINES = {"Twitter": 10, "GPT": 20}
+DEFAULT_SOURCE_DEADLINE = 15
+
+# The settings page calls Twitter "X"
+SOURCE_ALIASES = {"X": "Twitter"}
+
+# How many recent tweets to count per Twitter trend query
+MAX_TWEETS_PER_TOPIC = int(os.getenv('MAX_TWEETS_PER_TOPIC', '2000'))
+
+# Only fetch tweets newer than the last poll, and stay inside the 15-minute rate-limit window
+twitter_budget = RateLimitBudget()
+twitter_cursors = TopicCursorStore()
+
+# Shared pool so a source that overruns its deadline doesn't block the caller
+fanout_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="trend-fanout")
+
+def resolve_source(source):
+    return SOURCE_ALIASES.get(source, source)
+
 def search_trends(topic, source):
-    if source == "Twitter":
-        trends = twitter_client.search_recent_tweets(query=topic, max_results=10)
-        return [trend.text for trend in trends.data] if trends.data else []
+    source = resolve_source(source)
+    if source == "All":
+        return search_all_trends(topic)
+    elif source == "Twitter":
+        return search_twitter_trends(topic)
     elif source == "GPT":
         completion = openai.ChatCompletion.create(
             model="gpt-3.5-turbo",
@@ -36,7 +80,93 @@ def search_trends(topic, source):
         trends = completion.choices[0].message["content"].strip().split('\n')
         return trends
 
+# Function to update a topic's running tweet counts with only the tweets since the last poll
+def search_twitter_trends(topic, k=10):
+    since_id, counter = twitter_cursors.load(topic)
+    if counter is None:
+        since_id, counter = None, SlidingWindowCounter(k=k)
+    newest_id = ingest_tweets(
+        get_twitter_client(), topic, counter,
+        max_tweets=MAX_TWEETS_PER_TOPIC, since_id=since_id, budget=twitter_budget
+    )
+    twitter_cursors.save(topic, newest_id or since_id, counter)
+    trends = rank_trends(counter, topic, k)
+    if not trends:
+        # Nothing posted about the topic within the window, fall back to its latest tweets
+        logging.info(f"No recent Twitter activity for '{topic}', using its latest tweets")
+        trends = latest_tweet_texts(get_twitter_client(), topic, k, budget=twitter_budget)
+    return trends
+
+# Function to search trends through the trend cache
+def cached_search_trends(topic, source):
+    source = resolve_source(source)
+    if source == "All":
+        # Each source is cached on its own, so the merged list isn't
+        return search_all_trends(topic)
+    trends = trend_cache.get_or_fetch(topic, source, search_trends)
+    logging.info(f"Trend cache stats: {trend_cache.stats}")
+    return trends
+
+# Function to query every source concurrently, each within its own deadline
+def search_all_trends(topic, sources=None, deadlines=None):
+    sources = sources or TREND_SOURCES
+    deadlines = dict(SOURCE_DEADLINES, **(deadlines or {}))
+    for source in sources:
+        deadlines.setdefault(source, DEFAULT_SOURCE_DEADLINE)
+    start = time.monotonic()
+    pending = {
+        fanout_executor.submit(cached_search_trends, topic, source): source
+        for source in sources
+    }
+    results = {}
+
+    while pending:
+        elapsed = time.monotonic() - start
+        # Give up on sources whose deadline has passed
+        for future, source in list(pending.items()):
+            if elapsed >= deadlines[source]:
+                logging.warning(f"Trend source {source} missed its {deadlines[source]}s deadline")
+                del pending[future]
+        if not pending:
+            break
+        next_deadline = min(deadlines[source] for source in pending.values())
+        done, _ = wait(pending, timeout=next_deadline - elapsed, return_when=FIRST_COMPLETED)
+        for future in done:
+            source = pending.pop(future)
+            try:
+                results[source] = future.result() or []
+            except Exception as e:
+                logging.warning(f"Trend source {source} failed: {e}")
+
+    logging.info(f"Fetched trends from {sorted(results)} in {time.monotonic() - start:.2f}s")
+    return merge_trends([results[source] for source in sources if source in results])
+
+# Strip the list numbering and bullets GPT likes to add
+def clean_trend(trend):
+    return re.sub(r"^\s*(?:[-*\u2022]|\d+[.)])\s*", "", trend).strip()
+
+# Drop punctuation and case so near-identical trends compare equal
+def trend_key(trend):
+    return normalize_topic(re.sub(r"[^\w\s#@]", "", clean_trend(trend)))
+
+# Function to merge ranked trend lists into one de-duplicated list
+def merge_trends(ranked_lists):
+    scores = {}
+    display = {}
+    for trends in ranked_lists:
+        for rank, trend in enumerate(trends):
+            key = trend_key(trend)
+            if not key:
+                continue
+            # Reciprocal rank: trends near the top of several sources win
+            scores[key] = scores.get(key, 0) + 1.0 / (rank + 1)
+            display.setdefault(key, clean_trend(trend))
+    return [display[key] for key in sorted(scores, key=lambda k: scores[k], reverse=True)]
+
 def get_trends(query, session_state):
+    # Only the Streamlit views load the UI framework, so headless runs (batch.py, scheduler_worker.py) never do
+    import streamlit as st
+
     # Initialization
     if 'trend_engine' not in session_state:
         session_state['trend_engine'] = 'GPT'  # Default trend engine is GPT
@@ -50,7 +180,7 @@ def get_trends(query, session_state):
         st.session_state.clear()  # Correct way to clear the session state
 
     # Get trends from the selected engine
-    trends = search_trends(query, trend_function_choice)
+    trends = cached_search_trends(query, trend_function_choice)
 
     # Display the trends
     if trends:
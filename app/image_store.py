@@ -0,0 +1,88 @@
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+
+from PIL import Image
+
+STORE_DIR = os.getenv("IMAGE_STORE_DIR", os.path.join(".cache", "images"))
+
+# Longest side of the thumbnails shown in the UI
+THUMBNAIL_SIZE = 384
+
+
+# Function to build the index key for a prompt and style
+def prompt_key(prompt, style):
+    return hashlib.sha256(f"{style.lower()}\n{prompt}".encode()).hexdigest()
+
+
+# Content-addressed store of generated images with a prompt/style index and precomputed thumbnails
+class ImageStore:
+    def __init__(self, store_dir=STORE_DIR, thumbnail_size=THUMBNAIL_SIZE):
+        self.store_dir = store_dir
+        self.thumbnail_size = thumbnail_size
+        self.index_path = os.path.join(store_dir, "index.json")
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(store_dir, "objects"), exist_ok=True)
+        os.makedirs(os.path.join(store_dir, "thumbnails"), exist_ok=True)
+
+    def image_path(self, digest):
+        return os.path.join(self.store_dir, "objects", f"{digest}.png")
+
+    def thumbnail_path(self, digest):
+        return os.path.join(self.store_dir, "thumbnails", f"{digest}.jpg")
+
+    # Function to find the thumbnail for a stored image path
+    def thumbnail_for(self, image_path):
+        digest = os.path.splitext(os.path.basename(image_path))[0]
+        thumbnail = self.thumbnail_path(digest)
+        return thumbnail if os.path.exists(thumbnail) else image_path
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_index(self, index):
+        tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(index, f)
+        os.replace(tmp_path, self.index_path)
+
+    # Function to find a stored image for a prompt, returns its digest or None
+    def lookup(self, prompt, style):
+        with self._lock:
+            digest = self._load_index().get(prompt_key(prompt, style))
+        if digest and os.path.exists(self.image_path(digest)):
+            return digest
+        return None
+
+    # Function to store image bytes under their hash, returns the digest
+    def put(self, data, prompt=None, style=None):
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.image_path(digest)
+        if not os.path.exists(path):
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        if not os.path.exists(self.thumbnail_path(digest)):
+            self._write_thumbnail(data, digest)
+        if prompt is not None:
+            with self._lock:
+                index = self._load_index()
+                index[prompt_key(prompt, style or "")] = digest
+                self._save_index(index)
+        return digest
+
+    def _write_thumbnail(self, data, digest):
+        try:
+            image = Image.open(io.BytesIO(data)).convert("RGB")
+            image.thumbnail((self.thumbnail_size, self.thumbnail_size))
+            image.save(self.thumbnail_path(digest), "JPEG", quality=85, optimize=True)
+        except OSError as e:
+            logging.warning(f"Could not create thumbnail for {digest}: {e}")
@@ -2,13 +2,25 @@ import openai
 import streamlit as st
 from dotenv import load_dotenv
 import os
+import base64
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from app.openai_stream import stream_chat
+from app.image_store import ImageStore
 
 # Set up your OpenAI API key
 openai.api_key = os.getenv('YOUR_OPENAI_API_KEY', '')
 
+# Generated images are kept on disk so repeated prompts don't hit the API
+image_store = ImageStore()
+
+def profile_prompt(name, personality, interests):
+    return f"Create a virtual influencer profile with the name '{name}', personality '{personality}', and interests '{interests}'."
+
 # Function to generate influencer profile
 def generate_influencer_profile(name, personality, interests):
-    prompt = f"Create a virtual influencer profile with the name '{name}', personality '{personality}', and interests '{interests}'."
+    prompt = profile_prompt(name, personality, interests)
     try:
         response = openai.ChatCompletion.create(
             model="gpt-3.5-turbo",
@@ -18,20 +30,59 @@ def generate_influencer_profile(name, personality, interests):
     except Exception as e:
         return f"Error generating profile: {str(e)}"
 
-# Function to generate influencer content
-def generate_influencer_content(num_posts):
-    posts = []
+# Function to stream the influencer profile token by token
+def stream_influencer_profile(name, personality, interests):
+    prompt = profile_prompt(name, personality, interests)
     try:
-        for _ in range(num_posts):
-            prompt = "Write a fun and engaging Instagram post for a virtual influencer promoting a new tech gadget."
+        yield from stream_chat([{"role": "user", "content": prompt}], label=f"Profile for '{name}'")
+    except Exception as e:
+        yield f"Error generating profile: {str(e)}"
+
+POST_PROMPT = "Write a fun and engaging Instagram post for a virtual influencer promoting a new tech gadget."
+
+# Function to request a single post, retrying with backoff on failure
+def generate_influencer_post(retries=3):
+    for attempt in range(retries):
+        try:
             response = openai.ChatCompletion.create(
                 model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": prompt}]
+                messages=[{"role": "user", "content": POST_PROMPT}]
             )
-            posts.append(response['choices'][0]['message']['content'].strip())
-        return posts
+            return response['choices'][0]['message']['content'].strip()
+        except Exception:
+            if attempt == retries - 1:
+                raise
+            time.sleep(2 ** attempt)
+
+# Function to generate influencer content
+def generate_influencer_content(num_posts):
+    posts = []
+    # One multi-choice request sends the prompt once for every post
+    try:
+        response = openai.ChatCompletion.create(
+            model="gpt-3.5-turbo",
+            messages=[{"role": "user", "content": POST_PROMPT}],
+            n=int(num_posts)
+        )
+        posts = [choice['message']['content'].strip() for choice in response['choices']]
     except Exception as e:
-        return [f"Error generating posts: {str(e)}"]
+        logging.warning(f"Multi-choice post request failed, generating posts one by one: {e}")
+
+    # Fill in whatever is missing concurrently, each post with its own retries
+    missing = int(num_posts) - len(posts)
+    errors = []
+    if missing > 0:
+        with ThreadPoolExecutor(max_workers=missing) as executor:
+            futures = [executor.submit(generate_influencer_post) for _ in range(missing)]
+            for future in futures:
+                try:
+                    posts.append(future.result())
+                except Exception as e:
+                    errors.append(str(e))
+
+    if errors:
+        posts.append(f"Error generating {len(errors)} of {num_posts} posts: {errors[0]}")
+    return posts
 
 # Function to generate influencer image
 def generate_influencer_image(description, style):
@@ -57,13 +108,22 @@ def generate_influencer_image(description, style):
     else:
         dalle_prompt = f"Create an image of a virtual influencer with the following features: {description}, style: {style}."
 
+    digest = image_store.lookup(dalle_prompt, style)
+    if digest:
+        logging.info(f"Serving influencer image {digest} from the image store")
+        return image_store.image_path(digest)
+
     try:
+        # Ask for the bytes directly instead of a short-lived URL we'd have to download again
         response = openai.Image.create(
             prompt=dalle_prompt,
             n=1,
-            size="1024x1024"
+            size="1024x1024",
+            response_format="b64_json"
         )
-        return response['data'][0]['url']
+        data = base64.b64decode(response['data'][0]['b64_json'])
+        digest = image_store.put(data, dalle_prompt, style)
+        return image_store.image_path(digest)
     except Exception as e:
         return f"Error generating image: {str(e)}"
 
@@ -96,12 +156,12 @@ def main():
     description = st.text_input("Image Description", "A young, stylish influencer with a bright smile wearing trendy clothes")
     style = st.selectbox("Image Style", ["Realistic", "Cartoon", "Abstract"])
     if st.button("Generate Image"):
-        image_url = generate_influencer_image(description, style)
+        image_path = generate_influencer_image(description, style)
         st.subheader("Generated Image:")
-        if "Error" not in image_url:
-            st.image(image_url, caption="Generated Influencer Image", use_column_width=True)
+        if "Error" not in image_path:
+            st.image(image_store.thumbnail_for(image_path), caption="Generated Influencer Image", use_column_width=True)
         else:
-            st.error(image_url)
+            st.error(image_path)
 
 if __name__ == "__main__":
     main()
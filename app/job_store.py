@@ -0,0 +1,137 @@
+# Render jobs shared between the Streamlit app and the webhook service. They run as separate
+# apps on separate machines, so the jobs live in the shared MySQL database (app/db.py).
+import hashlib
+import hmac
+import os
+import time
+from contextlib import contextmanager
+from urllib.parse import quote
+
+from app.db import db_connection
+
+# Public base URL of the /render-callback route on the Flask service, e.g. https://example.com/render-callback
+WEBHOOK_BASE_URL = os.getenv("RENDER_WEBHOOK_BASE_URL", "")
+WEBHOOK_SECRET = os.getenv("RENDER_WEBHOOK_SECRET", "")
+
+# URL-safe names for each video engine
+ENGINE_SLUGS = {"D-ID": "d-id", "Heygen": "heygen"}
+
+# Engine statuses that mean a render is over
+FINISHED_STATUSES = ("done", "completed", "error", "rejected", "failed")
+
+
+def script_hash(script):
+    return hashlib.sha256(script.encode()).hexdigest()
+
+
+# Function to identify a render source: local files by their content, since paths like
+# uploaded_image.png get overwritten, and remote sources by their URL
+def source_key(source):
+    if source and os.path.isfile(source):
+        digest = hashlib.sha256()
+        with open(source, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        return f"sha256:{digest.hexdigest()}"
+    return source or ""
+
+
+# Function to build the callback URL an engine should notify, or None if webhooks aren't configured
+def callback_url(engine):
+    if not WEBHOOK_BASE_URL or not WEBHOOK_SECRET:
+        return None
+    return f"{WEBHOOK_BASE_URL.rstrip('/')}/{ENGINE_SLUGS[engine]}?token={quote(WEBHOOK_SECRET)}"
+
+
+# Function to check the token a callback came in with
+def verify_callback_token(token):
+    return bool(WEBHOOK_SECRET) and hmac.compare_digest(token or "", WEBHOOK_SECRET)
+
+
+# Function to map a callback URL slug back to its engine name
+def engine_for_slug(slug):
+    for engine, engine_slug in ENGINE_SLUGS.items():
+        if engine_slug == slug:
+            return engine
+    return None
+
+
+# Render jobs in the render_jobs table, created by migrations/002_render_jobs.sql
+class RenderJobStore:
+    @contextmanager
+    def _cursor(self):
+        # Pooled connections autocommit, so every statement is visible to the other service straight away
+        with db_connection() as connection:
+            cursor = connection.cursor(dictionary=True)
+            try:
+                yield cursor
+            finally:
+                cursor.close()
+
+    # Function to record a newly submitted render along with what it renders, so it can be resumed or reused
+    def create(self, engine, job_id, script=None, source=None, status="created"):
+        now = time.time()
+        content = (script, script_hash(script) if script else None, source, source_key(source) if source else None)
+        with self._cursor() as cursor:
+            # A fast callback may already have created the row, keep its status
+            cursor.execute(
+                """
+                INSERT INTO render_jobs (engine, job_id, status, script, script_hash, source, source_key, created_at, updated_at)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE
+                    script = VALUES(script),
+                    script_hash = VALUES(script_hash),
+                    source = VALUES(source),
+                    source_key = VALUES(source_key)
+                """,
+                (engine, job_id, status) + content + (now, now)
+            )
+
+    # Function to record a status change, e.g. from a completion callback
+    def update(self, engine, job_id, status, result_url=None, error=None):
+        now = time.time()
+        with self._cursor() as cursor:
+            cursor.execute(
+                """
+                INSERT INTO render_jobs (engine, job_id, status, result_url, error, created_at, updated_at)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE
+                    status = VALUES(status),
+                    result_url = COALESCE(VALUES(result_url), result_url),
+                    error = VALUES(error),
+                    updated_at = VALUES(updated_at)
+                """,
+                (engine, job_id, status, result_url, error, now, now)
+            )
+
+    def get(self, engine, job_id):
+        with self._cursor() as cursor:
+            cursor.execute("SELECT * FROM render_jobs WHERE engine = %s AND job_id = %s", (engine, job_id))
+            return cursor.fetchone()
+
+    # Function to find a recent render of the same script and source that finished or is still running
+    def find_reusable(self, engine, script, source, max_age=24 * 60 * 60):
+        with self._cursor() as cursor:
+            cursor.execute(
+                f"""
+                SELECT * FROM render_jobs
+                WHERE engine = %s AND script_hash = %s AND source_key = %s AND created_at >= %s
+                  AND (status NOT IN ({", ".join(["%s"] * len(FINISHED_STATUSES))}) OR (status IN ('done', 'completed') AND result_url IS NOT NULL))
+                ORDER BY created_at DESC LIMIT 1
+                """,
+                (engine, script_hash(script), source_key(source), time.time() - max_age) + FINISHED_STATUSES
+            )
+            return cursor.fetchone()
+
+    # Function to list renders that were submitted but never finished, e.g. before a restart
+    def unfinished(self, max_age=24 * 60 * 60):
+        with self._cursor() as cursor:
+            cursor.execute(
+                f"""
+                SELECT * FROM render_jobs
+                WHERE status NOT IN ({", ".join(["%s"] * len(FINISHED_STATUSES))}) AND created_at >= %s
+                ORDER BY created_at
+                """,
+                FINISHED_STATUSES + (time.time() - max_age,)
+            )
+            return cursor.fetchall()
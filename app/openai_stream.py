@@ -0,0 +1,22 @@
+import logging
+import time
+import openai
+
+# Function to stream a chat completion token by token, logging time-to-first-token
+def stream_chat(messages, model="gpt-3.5-turbo", label="completion"):
+    start = time.monotonic()
+    first_token_at = None
+    response = openai.ChatCompletion.create(
+        model=model,
+        messages=messages,
+        stream=True
+    )
+    for chunk in response:
+        token = chunk['choices'][0]['delta'].get('content')
+        if not token:
+            continue
+        if first_token_at is None:
+            first_token_at = time.monotonic()
+            logging.info(f"{label}: first token after {first_token_at - start:.2f}s")
+        yield token
+    logging.info(f"{label}: finished after {time.monotonic() - start:.2f}s")
@@ -0,0 +1,136 @@
+# Content pipeline run as stages, each checkpointed under a hash of its inputs so reruns skip finished work
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from app.stats import percentile
+
+CHECKPOINT_DIR = os.path.join(".cache", "pipeline")
+
+
+class Stage:
+    def __init__(self, name, run, inputs, workers=2, max_age=None, retries=2):
+        # run(context) -> JSON-serialisable output; inputs(context) -> dict of everything the output depends on
+        self.name = name
+        self.run = run
+        self.inputs = inputs
+        self.workers = workers
+        # Checkpoints older than this (seconds) are redone, None keeps them forever
+        self.max_age = max_age
+        self.retries = retries
+
+    def key(self, context):
+        payload = json.dumps({"stage": self.name, "inputs": self.inputs(context)}, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+
+# Stage outputs on disk, one JSON file per stage and input hash
+class CheckpointStore:
+    def __init__(self, checkpoint_dir=CHECKPOINT_DIR):
+        self.checkpoint_dir = checkpoint_dir
+
+    def _path(self, stage, key):
+        return os.path.join(self.checkpoint_dir, stage, f"{key}.json")
+
+    def get(self, stage, key, max_age=None):
+        try:
+            with open(self._path(stage, key), "r") as f:
+                checkpoint = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if max_age is not None and time.time() - checkpoint["created_at"] > max_age:
+            return None
+        return checkpoint
+
+    def set(self, stage, key, output):
+        path = self._path(stage, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"created_at": time.time(), "output": output}, f)
+        os.replace(tmp_path, path)
+
+
+class Pipeline:
+    def __init__(self, stages, checkpoints=None):
+        self.stages = stages
+        self.checkpoints = checkpoints or CheckpointStore()
+        # A pool per stage, so one job can be writing its script while another renders
+        self.pools = {
+            stage.name: ThreadPoolExecutor(max_workers=stage.workers, thread_name_prefix=f"pipeline-{stage.name}")
+            for stage in stages
+        }
+        # Seconds each stage took on the jobs it actually ran, and how many it skipped thanks to a checkpoint
+        self._stage_seconds = {stage.name: [] for stage in stages}
+        self._stage_reused = {stage.name: 0 for stage in stages}
+        self._stats_lock = threading.Lock()
+
+    # Function to summarise stage latencies so far: runs, p50 and p95 seconds over those runs, checkpoint reuse
+    def stats(self):
+        with self._stats_lock:
+            return {
+                name: {
+                    "count": len(seconds),
+                    "p50": percentile(seconds, 0.5),
+                    "p95": percentile(seconds, 0.95),
+                    "reused": self._stage_reused[name],
+                }
+                for name, seconds in self._stage_seconds.items()
+            }
+
+    # Function to start a job, returns a Future for its context: the inputs plus each stage's output by name
+    def submit(self, **inputs):
+        future = Future()
+        future.set_running_or_notify_cancel()
+        self._advance(future, dict(inputs), 0)
+        return future
+
+    def run(self, **inputs):
+        return self.submit(**inputs).result()
+
+    def _advance(self, future, context, index):
+        if index == len(self.stages):
+            future.set_result(context)
+            return
+        self.pools[self.stages[index].name].submit(self._run_stage, future, context, index)
+
+    def _run_stage(self, future, context, index):
+        stage = self.stages[index]
+        try:
+            context[stage.name] = self._execute(stage, context)
+        except Exception as e:
+            logging.exception(f"Pipeline stage {stage.name} failed")
+            future.set_exception(e)
+            return
+        self._advance(future, context, index + 1)
+
+    def _execute(self, stage, context):
+        key = stage.key(context)
+        checkpoint = self.checkpoints.get(stage.name, key, stage.max_age)
+        if checkpoint is not None:
+            logging.info(f"Pipeline stage {stage.name} already done, reusing checkpoint {key[:12]}")
+            # Reuse is counted on its own, a disk read would drag the latency percentiles towards zero
+            with self._stats_lock:
+                self._stage_reused[stage.name] += 1
+            return checkpoint["output"]
+
+        started = time.monotonic()
+        for attempt in range(stage.retries + 1):
+            try:
+                output = stage.run(context)
+                break
+            except Exception as e:
+                if attempt == stage.retries:
+                    raise
+                delay = random.uniform(0, 2 ** attempt)
+                logging.warning(f"Pipeline stage {stage.name} failed ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+        self.checkpoints.set(stage.name, key, output)
+        with self._stats_lock:
+            self._stage_seconds[stage.name].append(time.monotonic() - started)
+        return output
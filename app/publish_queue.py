@@ -0,0 +1,276 @@
+# YouTube publishing queue that spreads uploads across credentials within their daily quota
+import json
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from app.db import db_connection, DatabaseError
+
+# YouTube Data API quota: units per credential per day, and what one videos.insert costs
+DAILY_QUOTA_UNITS = int(os.getenv("YOUTUBE_DAILY_QUOTA", "10000"))
+UPLOAD_COST = 1600
+
+# The quota day rolls over at midnight Pacific time
+QUOTA_TIMEZONE = ZoneInfo("America/Los_Angeles")
+
+MAX_ATTEMPTS = 3
+TRANSIENT_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# 403 reasons YouTube gives when a credential has no quota left for the day
+QUOTA_ERROR_REASONS = {"quotaExceeded", "dailyLimitExceeded"}
+
+# How long (seconds) to wait before dispatching again when the quota table can't be reached
+DATABASE_RETRY_SECONDS = 60
+
+QUEUED = "queued"
+DEFERRED = "deferred"
+UPLOADING = "uploading"
+DONE = "done"
+FAILED = "failed"
+
+
+def quota_day(now=None):
+    return datetime.fromtimestamp(now or time.time(), QUOTA_TIMEZONE).date().isoformat()
+
+
+# Function to get the timestamp of the next quota reset
+def next_quota_reset(now=None):
+    local = datetime.fromtimestamp(now or time.time(), QUOTA_TIMEZONE)
+    midnight = datetime.combine(local.date() + timedelta(days=1), datetime.min.time(), QUOTA_TIMEZONE)
+    return midnight.timestamp()
+
+
+# Quota units spent per credential today, in the shared MySQL database (app/db.py) so restarts,
+# other dynos and batch runs all count against the same daily allowance.
+# The youtube_quota table is created by migrations/004_youtube_quota.sql.
+class QuotaTracker:
+    def __init__(self, daily_units=DAILY_QUOTA_UNITS):
+        self.daily_units = daily_units
+
+    @contextmanager
+    def _cursor(self):
+        with db_connection() as connection:
+            cursor = connection.cursor()
+            try:
+                yield cursor
+            finally:
+                cursor.close()
+
+    def remaining(self, credential):
+        with self._cursor() as cursor:
+            cursor.execute("SELECT used FROM youtube_quota WHERE credential = %s AND day = %s", (credential, quota_day()))
+            row = cursor.fetchone()
+        return self.daily_units - (row[0] if row else 0)
+
+    # Function to claim units for a call, returns False if the credential can't afford it today
+    def reserve(self, credential, units):
+        day = quota_day()
+        with self._cursor() as cursor:
+            cursor.execute("INSERT IGNORE INTO youtube_quota (credential, day, used) VALUES (%s, %s, 0)", (credential, day))
+            # Checked and spent in one statement, so concurrent uploads can't both take the last units
+            cursor.execute(
+                "UPDATE youtube_quota SET used = used + %s WHERE credential = %s AND day = %s AND used + %s <= %s",
+                (units, credential, day, units, self.daily_units)
+            )
+            return cursor.rowcount > 0
+
+    # Function to give back units reserved for a call that was never made
+    def refund(self, credential, units):
+        with self._cursor() as cursor:
+            cursor.execute(
+                "UPDATE youtube_quota SET used = GREATEST(0, used - %s) WHERE credential = %s AND day = %s",
+                (units, credential, quota_day())
+            )
+
+    # Function to mark a credential's quota as spent for the rest of the day, e.g. when YouTube says so
+    def exhaust(self, credential):
+        with self._cursor() as cursor:
+            cursor.execute(
+                """
+                INSERT INTO youtube_quota (credential, day, used) VALUES (%s, %s, %s)
+                ON DUPLICATE KEY UPDATE used = GREATEST(used, VALUES(used))
+                """,
+                (credential, quota_day(), self.daily_units)
+            )
+
+
+# Function to list every configured channel credential: YOUTUBE_API_KEY plus
+# extra channels from YOUTUBE_API_KEYS as "name=key,name=key"
+def youtube_credentials():
+    credentials = {"default": os.getenv("YOUTUBE_API_KEY", "")}
+    for entry in os.getenv("YOUTUBE_API_KEYS", "").split(","):
+        if "=" in entry:
+            name, key = entry.split("=", 1)
+            credentials[name.strip()] = key.strip()
+    return credentials
+
+
+# Function to tell failures worth retrying (YouTube or the video source overloaded, a dropped
+# connection) from ones that would fail the same way again, like a dead video link
+def is_transient_error(e):
+    import requests
+    from googleapiclient.errors import HttpError
+
+    if isinstance(e, HttpError):
+        return e.resp.status in TRANSIENT_STATUS_CODES
+    if isinstance(e, requests.HTTPError):
+        return e.response is not None and e.response.status_code in TRANSIENT_STATUS_CODES
+    return isinstance(e, (requests.ConnectionError, requests.Timeout, ConnectionError, TimeoutError))
+
+
+# Function to tell whether YouTube refused a call because the credential's daily quota is spent
+def is_quota_error(e):
+    from googleapiclient.errors import HttpError
+
+    if not isinstance(e, HttpError) or e.resp.status != 403:
+        return False
+    try:
+        errors = json.loads(e.content).get("error", {}).get("errors", [])
+    except (AttributeError, TypeError, ValueError):
+        return False
+    return any(error.get("reason") in QUOTA_ERROR_REASONS for error in errors)
+
+
+class PublishQueue:
+    def __init__(self, credentials, max_workers=8, per_credential_uploads=2, quota=None):
+        # credentials maps a name (one per channel) to its YouTube API key
+        self.credentials = credentials
+        self.quota = quota or QuotaTracker()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="publish")
+        self._slots = {name: threading.BoundedSemaphore(per_credential_uploads) for name in credentials}
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+
+    # Function to queue an upload, returns its job id straight away
+    def submit(self, video_url, title, description, category_id, tags, credential=None):
+        if credential is not None and credential not in self.credentials:
+            raise ValueError(f"Unknown YouTube credential: {credential}")
+        job_id = uuid.uuid4().hex
+        job = {
+            "id": job_id,
+            "video_url": video_url,
+            "title": title,
+            "description": description,
+            "category_id": category_id,
+            "tags": tags,
+            "credential": credential,
+            "state": QUEUED,
+            "attempts": 0,
+            "retry_at": None,
+            "response": None,
+            "error": None,
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+        self._dispatch(job_id)
+        return job_id
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def _set(self, job_id, **changes):
+        with self._lock:
+            self._jobs[job_id].update(changes)
+            self._changed.notify_all()
+
+    # Function to block until an upload is done or has failed, for callers that aren't a UI.
+    # Deferred uploads can wait for the next quota day, so pass a timeout if that's too long.
+    def wait(self, job_id, timeout=None):
+        with self._lock:
+            self._changed.wait_for(lambda: self._jobs[job_id]["state"] in (DONE, FAILED), timeout)
+            return dict(self._jobs[job_id])
+
+    # Function to pick a credential with quota left, the job's own channel first if it named one
+    def _pick_credential(self, preferred):
+        names = [preferred] if preferred else sorted(self.credentials, key=self.quota.remaining, reverse=True)
+        for name in names:
+            if self.quota.reserve(name, UPLOAD_COST):
+                return name
+        return None
+
+    def _later(self, delay, job_id):
+        timer = threading.Timer(max(0, delay), self._dispatch, args=(job_id,))
+        timer.daemon = True
+        timer.start()
+
+    def _dispatch(self, job_id):
+        job = self.get(job_id)
+        try:
+            credential = self._pick_credential(job["credential"])
+        except DatabaseError as e:
+            logging.warning(f"Could not check YouTube quota for upload {job_id} ({e}), retrying in {DATABASE_RETRY_SECONDS}s")
+            self._later(DATABASE_RETRY_SECONDS, job_id)
+            return
+        if credential is None:
+            # Every usable credential is out of quota, try again after the daily reset
+            retry_at = next_quota_reset()
+            logging.info(f"Deferring upload {job_id} until quota resets at {time.ctime(retry_at)}")
+            self._set(job_id, state=DEFERRED, retry_at=retry_at)
+            self._later(retry_at - time.time() + 1, job_id)
+            return
+        self.executor.submit(self._run, job_id, credential)
+
+    def _run(self, job_id, credential):
+        # The Google API client is slow to import, so only upload workers load it
+        from clients.youtube import YoutubeClient
+
+        job = self.get(job_id)
+        with self._slots[credential]:
+            self._set(job_id, state=UPLOADING, attempts=job["attempts"] + 1, retry_at=None)
+            client = YoutubeClient(self.credentials[credential])
+            try:
+                client.authenticate()
+                response = client.upload_video(job["video_url"], job["title"], job["description"], job["category_id"], job["tags"])
+            except Exception as e:
+                if not client.insert_sent:
+                    # Failed before videos.insert went out, e.g. opening the video source, so it cost nothing
+                    try:
+                        self.quota.refund(credential, UPLOAD_COST)
+                    except DatabaseError as db_error:
+                        logging.warning(f"Could not refund YouTube quota for {credential}: {db_error}")
+                if is_quota_error(e):
+                    # Our count was behind YouTube's: the credential is spent until the reset, so try another or defer
+                    logging.warning(f"YouTube quota for {credential} is used up, requeueing upload {job_id}")
+                    delay = 0
+                    try:
+                        self.quota.exhaust(credential)
+                    except DatabaseError as db_error:
+                        # Until it's recorded the credential looks usable, so don't pick it straight away again
+                        logging.warning(f"Could not mark YouTube quota for {credential} as spent: {db_error}")
+                        delay = DATABASE_RETRY_SECONDS
+                    self._set(job_id, state=QUEUED, retry_at=time.time() + delay, error=str(e))
+                    self._later(delay, job_id)
+                elif is_transient_error(e) and job["attempts"] + 1 < MAX_ATTEMPTS:
+                    delay = random.uniform(0, 30 * 2 ** job["attempts"])
+                    logging.warning(f"Upload {job_id} failed ({e}), retrying in {delay:.0f}s")
+                    self._set(job_id, state=QUEUED, retry_at=time.time() + delay, error=str(e))
+                    self._later(delay, job_id)
+                else:
+                    logging.exception(f"Upload {job_id} failed")
+                    self._set(job_id, state=FAILED, error=str(e))
+                return
+        self._set(job_id, state=DONE, response=response, credential=credential, error=None)
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+# Function to get the process-wide publishing queue. It's shared by every session, so its
+# credentials come from the environment rather than from whichever caller happened to be first.
+def get_publish_queue():
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = PublishQueue(youtube_credentials())
+        return _queue
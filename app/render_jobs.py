@@ -0,0 +1,104 @@
+# Background render jobs, so rendering a video never blocks the Streamlit script thread
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from app.render_poller import render_times
+
+# Finished jobs are forgotten after this long (seconds)
+FINISHED_JOB_TTL = 24 * 60 * 60
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class RenderJobManager:
+    def __init__(self, render, max_workers=16):
+        # render(script, source_url, preferred_engine, report) -> video URL or None, runs on a worker thread.
+        # It owns per-engine concurrency and calls report(**changes) to update the job as it goes.
+        self.render = render
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="render")
+        self._jobs = {}
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    # Function to queue a render, returns its job id straight away.
+    # render overrides the manager's render function for this job, e.g. to resume one instead.
+    def submit(self, engine, script, source_url, render=None):
+        job_id = uuid.uuid4().hex
+        job = {
+            "id": job_id,
+            "engine": engine,
+            "state": QUEUED,
+            "script_length": len(script or ""),
+            "video_url": None,
+            "error": None,
+            "submitted_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+        }
+        with self._lock:
+            self._prune()
+            self._jobs[job_id] = job
+            self._futures[job_id] = self.executor.submit(self._run, job_id, script, source_url, render or self.render)
+        return job_id
+
+    def _prune(self):
+        cutoff = time.time() - FINISHED_JOB_TTL
+        for job_id in [j for j, job in self._jobs.items() if (job["finished_at"] or time.time()) < cutoff]:
+            del self._jobs[job_id]
+            del self._futures[job_id]
+
+    def _set(self, job_id, **changes):
+        with self._lock:
+            self._jobs[job_id].update(changes)
+
+    def _run(self, job_id, script, source_url, render):
+        engine = self._jobs[job_id]["engine"]
+        try:
+            video_url = render(script, source_url, engine, lambda **changes: self._set(job_id, **changes))
+        except Exception as e:
+            logging.exception(f"Render job {job_id} failed")
+            self._set(job_id, state=FAILED, error=str(e), finished_at=time.time())
+            return None
+        if video_url:
+            self._set(job_id, state=DONE, video_url=video_url, finished_at=time.time())
+        else:
+            self._set(job_id, state=FAILED, error="Render failed or timed out", finished_at=time.time())
+        return video_url
+
+    # Function to read a job without blocking, with a rough progress estimate for running jobs
+    def get(self, job_id):
+        with self._lock:
+            job = dict(self._jobs[job_id]) if job_id in self._jobs else None
+        if job is None:
+            return None
+        if job["state"] == RUNNING and job["started_at"]:
+            expected = render_times.expected_seconds(job["engine"], job["script_length"])
+            job["progress"] = min(0.95, (time.time() - job["started_at"]) / expected)
+        else:
+            job["progress"] = 1.0 if job["state"] in (DONE, FAILED) else 0.0
+        return job
+
+    # Function to block until a job finishes, for callers that aren't a UI
+    def wait(self, job_id, timeout=None):
+        with self._lock:
+            future = self._futures[job_id]
+        return future.result(timeout=timeout)
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+# Function to get the process-wide job manager, shared by every Streamlit session
+def get_render_manager(render):
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = RenderJobManager(render)
+        return _manager
@@ -0,0 +1,151 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+
+RENDER_TIMES_PATH = os.getenv("RENDER_TIMES_PATH", os.path.join(".cache", "render_times.json"))
+
+# Seconds of render time per script character before we have observed anything
+DEFAULT_SECONDS_PER_CHAR = 0.1
+MIN_EXPECTED_SECONDS = 10
+
+# Statuses after which polling stops
+DONE_STATUSES = {"done", "completed"}
+FAILED_STATUSES = {"error", "rejected", "failed"}
+
+
+# Raised when a render is still unfinished at the timeout. The engine may yet finish it,
+# so unlike a failed status it's no reason to start the same render elsewhere.
+class RenderTimeout(Exception):
+    pass
+
+
+# Function to check a render once, treating a failed check (an error page, a dropped connection)
+# as "status unknown" rather than as a failed render
+async def check_status(fetch_status, engine):
+    try:
+        return await fetch_status()
+    except Exception as e:
+        logging.warning(f"Could not check {engine} render status: {e}")
+        return None, None
+
+
+# Learns how long renders take per script character for each engine, as a moving average
+class RenderTimeModel:
+    def __init__(self, path=RENDER_TIMES_PATH, alpha=0.3):
+        self.path = path
+        self.alpha = alpha
+        self._lock = threading.Lock()
+        try:
+            with open(path, "r") as f:
+                self._rates = json.load(f)
+        except (OSError, ValueError):
+            self._rates = {}
+
+    # Function to estimate how long a render of this script will take
+    def expected_seconds(self, engine, script_length):
+        with self._lock:
+            rate = self._rates.get(engine, DEFAULT_SECONDS_PER_CHAR)
+        return max(MIN_EXPECTED_SECONDS, rate * max(script_length, 1))
+
+    # Function to fold an observed render time into the average
+    def observe(self, engine, script_length, seconds):
+        rate = seconds / max(script_length, 1)
+        with self._lock:
+            previous = self._rates.get(engine)
+            self._rates[engine] = rate if previous is None else (1 - self.alpha) * previous + self.alpha * rate
+            rates = dict(self._rates)
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(rates, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logging.warning(f"Could not save render times: {e}")
+
+
+render_times = RenderTimeModel()
+
+
+# Function to pick the next wait: sparse while the render is young, tighter near the expected finish,
+# then backing off geometrically once it runs late
+def next_interval(elapsed, expected, previous, min_interval=2, max_interval=30):
+    remaining = expected - elapsed
+    if remaining > 0:
+        interval = remaining / 2
+    else:
+        interval = previous * 1.5
+    return min(max_interval, max(min_interval, interval))
+
+
+# Function to poll the async fetch_status() -> (status, result_url) until the render finishes.
+# Returns the result URL, or None if the engine reports the render failed. Raises RenderTimeout.
+async def poll_render(fetch_status, engine, script_length, timeout=600, min_interval=2, max_interval=30):
+    start = time.monotonic()
+    expected = render_times.expected_seconds(engine, script_length)
+    interval = min_interval
+    checks = 0
+    while True:
+        elapsed = time.monotonic() - start
+        interval = next_interval(elapsed, expected, interval, min_interval, max_interval)
+        if elapsed + interval > timeout:
+            interval = max(0, timeout - elapsed)
+        await asyncio.sleep(interval)
+
+        status, result_url = await check_status(fetch_status, engine)
+        checks += 1
+        elapsed = time.monotonic() - start
+        if status in DONE_STATUSES and result_url:
+            render_times.observe(engine, script_length, elapsed)
+            logging.info(f"{engine} render finished in {elapsed:.0f}s after {checks} status checks")
+            return result_url
+        if status in FAILED_STATUSES:
+            logging.warning(f"{engine} render failed with status {status}")
+            return None
+        if elapsed >= timeout:
+            raise RenderTimeout(f"{engine} render timed out after {elapsed:.0f}s")
+
+
+# Function to wait for a render that reports completion through a webhook into the job store.
+# The store is cheap to check, so it's read every second; the engine's API is only polled as a
+# fallback, sparsely, in case the callback never arrives. Returns like poll_render.
+async def wait_for_render(job_store, engine, job_id, fetch_status, script_length, timeout=600,
+                          check_interval=1, fallback_min_interval=60, fallback_max_interval=180):
+    start = time.monotonic()
+    expected = render_times.expected_seconds(engine, script_length)
+    # First fallback poll well after the render should have called back
+    next_poll = max(fallback_min_interval, expected * 2)
+    poll_interval = fallback_min_interval
+    while True:
+        elapsed = time.monotonic() - start
+        try:
+            job = job_store.get(engine, job_id)
+        except Exception as e:
+            # The database may be back by the next check, and the render doesn't depend on it
+            logging.warning(f"Could not read {engine} render {job_id} from the job store: {e}")
+            job = None
+        status, result_url = (job["status"], job["result_url"]) if job else (None, None)
+
+        if elapsed >= next_poll:
+            status, result_url = await check_status(fetch_status, engine)
+            if status:
+                try:
+                    job_store.update(engine, job_id, status, result_url)
+                except Exception as e:
+                    logging.warning(f"Could not record {engine} render {job_id} status: {e}")
+            poll_interval = min(fallback_max_interval, poll_interval * 2)
+            next_poll = elapsed + poll_interval
+
+        if status in DONE_STATUSES and result_url:
+            render_times.observe(engine, script_length, elapsed)
+            logging.info(f"{engine} render {job_id} finished in {elapsed:.0f}s")
+            return result_url
+        if status in FAILED_STATUSES:
+            logging.warning(f"{engine} render {job_id} failed with status {status}")
+            return None
+        if elapsed >= timeout:
+            raise RenderTimeout(f"{engine} render {job_id} timed out after {elapsed:.0f}s")
+        await asyncio.sleep(check_interval)
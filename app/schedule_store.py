@@ -0,0 +1,223 @@
+# Scheduled posts in the shared MySQL database (app/db.py), so the schedule page and scheduler
+# workers on other machines all see the same posts
+import json
+import logging
+import os
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+from app.db import db_connection
+
+# The JSON file scheduled posts lived in before this store
+LEGACY_SCHEDULE_PATH = "scheduled_posts.json"
+
+# A claimed post must be renewed within this long (seconds) or another worker may take it over
+DEFAULT_LEASE_SECONDS = 120
+
+# A post whose worker keeps dying is given up after this many claims
+MAX_ATTEMPTS = 3
+
+SCHEDULED = "scheduled"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+# Scheduled posts in the scheduled_posts table, created by migrations/003_scheduled_posts.sql
+class ScheduleStore:
+    def __init__(self, legacy_path=LEGACY_SCHEDULE_PATH):
+        self._migrate_legacy(legacy_path)
+
+    @contextmanager
+    def _cursor(self):
+        # Pooled connections autocommit, so the page and every worker see a change straight away
+        with db_connection() as connection:
+            cursor = connection.cursor(dictionary=True)
+            try:
+                yield cursor
+            finally:
+                cursor.close()
+
+    # Function to run statements as one transaction, rolled back if any of them fails
+    @contextmanager
+    def _transaction(self):
+        with db_connection() as connection:
+            connection.start_transaction()
+            cursor = connection.cursor(dictionary=True)
+            try:
+                yield cursor
+                connection.commit()
+            except Exception:
+                connection.rollback()
+                raise
+            finally:
+                cursor.close()
+
+    # Function to import posts from scheduled_posts.json once, then move the file aside
+    def _migrate_legacy(self, legacy_path):
+        if not legacy_path:
+            return
+        migrated_path = f"{legacy_path}.migrated"
+        try:
+            # Moving the file first means only one process imports it
+            os.replace(legacy_path, migrated_path)
+        except OSError:
+            return
+        try:
+            with open(migrated_path, "r") as f:
+                posts = json.load(f)
+        except ValueError:
+            logging.warning(f"Could not parse {legacy_path}, left it at {migrated_path}")
+            return
+        now = time.time()
+        with self._cursor() as cursor:
+            for topic, details in posts.items():
+                due_at = datetime.strptime(details["date"] + " " + details["time"], "%Y-%m-%d %H:%M:%S").timestamp()
+                cursor.execute(
+                    "INSERT INTO scheduled_posts (id, topic, due_at, settings, status, created_at, updated_at) VALUES (%s, %s, %s, %s, %s, %s, %s)",
+                    (uuid.uuid4().hex, topic, due_at, "{}", SCHEDULED, now, now)
+                )
+        logging.info(f"Migrated {len(posts)} scheduled posts from {legacy_path}")
+
+    def _row(self, row):
+        if row is None:
+            return None
+        post = dict(row)
+        post["settings"] = json.loads(post["settings"])
+        return post
+
+    # Function to schedule a post, returns its id
+    def add(self, topic, due_at, settings=None):
+        post_id = uuid.uuid4().hex
+        now = time.time()
+        with self._cursor() as cursor:
+            cursor.execute(
+                """
+                INSERT INTO scheduled_posts (id, topic, due_at, settings, status, created_at, updated_at)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+                """,
+                (post_id, topic, due_at, json.dumps(settings or {}), SCHEDULED, now, now)
+            )
+        return post_id
+
+    # Function to delete a post that hasn't run yet, returns False if it was already gone or started
+    def remove(self, post_id):
+        with self._cursor() as cursor:
+            cursor.execute("DELETE FROM scheduled_posts WHERE id = %s AND status = %s", (post_id, SCHEDULED))
+            return cursor.rowcount > 0
+
+    def get(self, post_id):
+        with self._cursor() as cursor:
+            cursor.execute("SELECT * FROM scheduled_posts WHERE id = %s", (post_id,))
+            return self._row(cursor.fetchone())
+
+    # Function to record a post's progress, returns False if the post isn't in the expected state
+    def update(self, post_id, status, error=None, expected_status=None):
+        query = "UPDATE scheduled_posts SET status = %s, error = %s, updated_at = %s WHERE id = %s"
+        params = (status, error, time.time(), post_id)
+        if expected_status:
+            query += " AND status = %s"
+            params += (expected_status,)
+        with self._cursor() as cursor:
+            cursor.execute(query, params)
+            return cursor.rowcount > 0
+
+    # Function to list posts waiting to run, soonest first, optionally only those due between start and end
+    def upcoming(self, start=None, end=None, limit=None):
+        query = "SELECT * FROM scheduled_posts WHERE status = %s"
+        params = (SCHEDULED,)
+        if start is not None:
+            query += " AND due_at >= %s"
+            params += (start,)
+        if end is not None:
+            query += " AND due_at <= %s"
+            params += (end,)
+        query += " ORDER BY due_at"
+        if limit is not None:
+            query += " LIMIT %s"
+            params += (limit,)
+        with self._cursor() as cursor:
+            cursor.execute(query, params)
+            return [self._row(row) for row in cursor.fetchall()]
+
+    # Function to list posts whose time has come
+    def due(self, now=None, limit=None):
+        return self.upcoming(end=now or time.time(), limit=limit)
+
+    # Function to list posts a worker is running right now
+    def leased(self):
+        with self._cursor() as cursor:
+            cursor.execute("SELECT * FROM scheduled_posts WHERE status = %s ORDER BY lease_until", (RUNNING,))
+            return [self._row(row) for row in cursor.fetchall()]
+
+    # Function to list posts changed since a timestamp, so a worker can keep its in-memory schedule in sync
+    def changed_since(self, since):
+        with self._cursor() as cursor:
+            cursor.execute("SELECT * FROM scheduled_posts WHERE updated_at > %s ORDER BY updated_at", (since,))
+            return [self._row(row) for row in cursor.fetchall()]
+
+    # Function to atomically claim due posts, plus running posts whose worker let the lease expire.
+    # SELECT ... FOR UPDATE locks the rows until the claim commits, so two workers never claim the same post.
+    def claim(self, worker_id, post_ids=None, limit=1, lease_seconds=DEFAULT_LEASE_SECONDS, now=None):
+        now = now or time.time()
+        query = """
+            SELECT id FROM scheduled_posts
+            WHERE ((status = %s AND due_at <= %s) OR (status = %s AND lease_until < %s))
+        """
+        params = (SCHEDULED, now, RUNNING, now)
+        if post_ids is not None:
+            query += f" AND id IN ({', '.join(['%s'] * len(post_ids))})"
+            params += tuple(post_ids)
+        query += " ORDER BY due_at LIMIT %s FOR UPDATE"
+        params += (limit,)
+        with self._transaction() as cursor:
+            cursor.execute(query, params)
+            ids = tuple(row["id"] for row in cursor.fetchall())
+            if not ids:
+                return []
+            placeholders = ", ".join(["%s"] * len(ids))
+            # Posts that already used up their attempts fail instead of being run again
+            cursor.execute(
+                f"""
+                UPDATE scheduled_posts SET status = %s, error = %s, claimed_by = NULL, lease_until = NULL, updated_at = %s
+                WHERE id IN ({placeholders}) AND attempts >= %s
+                """,
+                (FAILED, "Worker lease expired too many times", now) + ids + (MAX_ATTEMPTS,)
+            )
+            cursor.execute(
+                f"""
+                UPDATE scheduled_posts
+                SET status = %s, claimed_by = %s, lease_until = %s, attempts = attempts + 1, updated_at = %s
+                WHERE id IN ({placeholders}) AND status != %s
+                """,
+                (RUNNING, worker_id, now + lease_seconds, now) + ids + (FAILED,)
+            )
+            cursor.execute(
+                f"SELECT * FROM scheduled_posts WHERE id IN ({placeholders}) AND claimed_by = %s AND status = %s",
+                ids + (worker_id, RUNNING)
+            )
+            return [self._row(row) for row in cursor.fetchall()]
+
+    # Function to extend a claim, returns False if the worker has lost the post to another one
+    def renew(self, post_id, worker_id, lease_seconds=DEFAULT_LEASE_SECONDS):
+        now = time.time()
+        with self._cursor() as cursor:
+            cursor.execute(
+                "UPDATE scheduled_posts SET lease_until = %s WHERE id = %s AND claimed_by = %s AND status = %s",
+                (now + lease_seconds, post_id, worker_id, RUNNING)
+            )
+            return cursor.rowcount > 0
+
+    # Function to record how a claimed post ended, only if the worker still holds it
+    def finish(self, post_id, worker_id, status, error=None):
+        with self._cursor() as cursor:
+            cursor.execute(
+                """
+                UPDATE scheduled_posts SET status = %s, error = %s, lease_until = NULL, updated_at = %s
+                WHERE id = %s AND claimed_by = %s AND status = %s
+                """,
+                (status, error, time.time(), post_id, worker_id, RUNNING)
+            )
+            return cursor.rowcount > 0
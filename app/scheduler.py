@@ -0,0 +1,109 @@
+# Min-heap scheduler that sleeps exactly until the next due job
+import heapq
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Scheduler:
+    def __init__(self, callback, max_workers=4):
+        # callback(job_id, payload) runs on a worker pool when a job comes due
+        self.callback = callback
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="scheduled-job")
+        self._heap = []
+        # job_id -> (fire_at, seq, payload); a heap entry is live only while its seq matches
+        self._jobs = {}
+        self._seq = itertools.count()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stopped = False
+
+    def __len__(self):
+        with self._condition:
+            return len(self._jobs)
+
+    # Function to add or reschedule a job, fire_at is a Unix timestamp
+    def add(self, job_id, fire_at, payload=None):
+        with self._condition:
+            seq = next(self._seq)
+            self._jobs[job_id] = (fire_at, seq, payload)
+            heapq.heappush(self._heap, (fire_at, seq, job_id))
+            # Wake the loop only if this job is now the next one due
+            if self._heap[0][1] == seq:
+                self._condition.notify()
+
+    # Function to cancel a job, its heap entry is dropped lazily
+    def remove(self, job_id):
+        with self._condition:
+            if self._jobs.pop(job_id, None) is None:
+                return False
+            self._compact()
+            self._condition.notify()
+            return True
+
+    def next_fire_time(self):
+        with self._condition:
+            self._drop_stale()
+            return self._heap[0][0] if self._heap else None
+
+    def _live(self, entry):
+        job = self._jobs.get(entry[2])
+        return job is not None and job[1] == entry[1]
+
+    def _drop_stale(self):
+        while self._heap and not self._live(self._heap[0]):
+            heapq.heappop(self._heap)
+
+    def _compact(self):
+        # Keep cancelled entries from outgrowing the live ones
+        if len(self._heap) > 2 * len(self._jobs) + 64:
+            self._heap = [(fire_at, seq, job_id) for job_id, (fire_at, seq, _) in self._jobs.items()]
+            heapq.heapify(self._heap)
+
+    def running(self):
+        with self._condition:
+            return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        with self._condition:
+            if self._thread is not None and self._thread.is_alive():
+                return self._thread
+            self._stopped = False
+            self._thread = threading.Thread(target=self._run, daemon=True, name="scheduler")
+            self._thread.start()
+        return self._thread
+
+    def stop(self):
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while True:
+                    if self._stopped:
+                        return
+                    self._drop_stale()
+                    if not self._heap:
+                        self._condition.wait()
+                        continue
+                    delay = self._heap[0][0] - time.time()
+                    if delay > 0:
+                        # Adds and removes notify, so a new earlier job cuts this short
+                        self._condition.wait(delay)
+                        continue
+                    _, _, job_id = heapq.heappop(self._heap)
+                    _, _, payload = self._jobs.pop(job_id)
+                    break
+            logging.info(f"Scheduled job {job_id} is due")
+            self.executor.submit(self._fire, job_id, payload)
+
+    def _fire(self, job_id, payload):
+        try:
+            self.callback(job_id, payload)
+        except Exception:
+            logging.exception(f"Scheduled job {job_id} failed")
+
@@ -0,0 +1,10 @@
+# Small statistics helpers shared by the pipeline report and the database pool metrics
+import math
+
+
+# Function to get the nearest-rank percentile of a list of numbers
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))]
@@ -0,0 +1,152 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# How long cached trends stay fresh for each engine (seconds)
+DEFAULT_TTLS = {
+    "Twitter": 15 * 60,
+    "GPT": 24 * 60 * 60,
+}
+DEFAULT_TTL = 60 * 60
+
+CACHE_DIR = os.getenv("TREND_CACHE_DIR", os.path.join(".cache", "trends"))
+
+
+# Normalize a topic so "  AI  News" and "ai news" share a cache entry
+def normalize_topic(topic):
+    return " ".join(str(topic).lower().split())
+
+
+# Two-tier trend cache: an in-process LRU in front of a shared on-disk store
+class TrendCache:
+    def __init__(self, cache_dir=CACHE_DIR, max_memory_entries=256, max_disk_entries=5000, ttls=None):
+        self.cache_dir = cache_dir
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+        self._writes = 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def ttl_for(self, engine):
+        return self.ttls.get(engine, DEFAULT_TTL)
+
+    def _key(self, topic, engine):
+        return hashlib.sha256(f"{engine}:{normalize_topic(topic)}".encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    # Function to look up cached trends, returns None on a miss or expired entry
+    def get(self, topic, engine):
+        key = self._key(topic, engine)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry["expires_at"] > now:
+                    self._memory.move_to_end(key)
+                    self.stats["memory_hits"] += 1
+                    return list(entry["trends"])
+                del self._memory[key]
+
+        entry = self._read_disk(key)
+        if entry is not None and entry["expires_at"] > now:
+            with self._lock:
+                self._remember(key, entry)
+                self.stats["disk_hits"] += 1
+            return list(entry["trends"])
+
+        with self._lock:
+            self.stats["misses"] += 1
+        return None
+
+    # Function to store trends in both tiers
+    def set(self, topic, engine, trends):
+        key = self._key(topic, engine)
+        entry = {
+            "topic": normalize_topic(topic),
+            "engine": engine,
+            "trends": list(trends),
+            "expires_at": time.time() + self.ttl_for(engine),
+        }
+        with self._lock:
+            self._remember(key, entry)
+        self._write_disk(key, entry)
+
+    # Function to return cached trends or compute and cache them
+    def get_or_fetch(self, topic, engine, fetch):
+        trends = self.get(topic, engine)
+        if trends is not None:
+            return trends
+        trends = fetch(topic, engine)
+        # Don't cache empty results so a transient failure isn't remembered
+        if trends:
+            self.set(topic, engine, trends)
+        return trends
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".json"):
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                except OSError:
+                    pass
+
+    def _remember(self, key, entry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def _read_disk(self, key):
+        try:
+            with open(self._path(key), "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_disk(self, key, entry):
+        # Write to a temp file and rename so readers never see a partial entry
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logging.warning(f"Could not write trend cache entry: {e}")
+            return
+        # Listing the directory is O(n), so only check the size bound now and then
+        with self._lock:
+            self._writes += 1
+            check_size = self._writes % 32 == 1
+        if check_size:
+            self._evict_disk()
+
+    def _evict_disk(self):
+        try:
+            names = [n for n in os.listdir(self.cache_dir) if n.endswith(".json")]
+        except OSError:
+            return
+        if len(names) <= self.max_disk_entries:
+            return
+        # Drop the least recently written entries first
+        paths = [os.path.join(self.cache_dir, n) for n in names]
+        paths.sort(key=lambda p: os.path.getmtime(p) if os.path.exists(p) else 0)
+        for path in paths[:len(paths) - self.max_disk_entries]:
+            try:
+                os.remove(path)
+                with self._lock:
+                    self.stats["evictions"] += 1
+            except OSError:
+                pass
@@ -0,0 +1,246 @@
+import hashlib
+import heapq
+import logging
+import re
+import time
+import zlib
+from array import array
+from datetime import datetime, timezone
+
+from app.twitter_budget import RateLimitDeferred
+
+SEARCH_ENDPOINT = "search_recent_tweets"
+
+# Words too common to ever be a trend on their own
+STOPWORDS = {
+    "a", "about", "after", "all", "also", "am", "an", "and", "any", "are", "as", "at", "be", "been",
+    "but", "by", "can", "could", "did", "do", "does", "for", "from", "get", "got", "had", "has",
+    "have", "he", "her", "his", "how", "i", "if", "in", "into", "is", "it", "its", "just", "like",
+    "me", "more", "my", "no", "not", "now", "of", "on", "one", "or", "our", "out", "over", "rt",
+    "she", "so", "some", "than", "that", "the", "their", "them", "then", "there", "these", "they",
+    "this", "to", "up", "us", "was", "we", "were", "what", "when", "which", "who", "why", "will",
+    "with", "would", "you", "your",
+}
+
+URL_RE = re.compile(r"https?://\S+")
+MENTION_RE = re.compile(r"@\w+")
+HASHTAG_RE = re.compile(r"#(\w+)")
+WORD_RE = re.compile(r"[a-z][a-z0-9']+")
+
+
+# Function to page through recent tweets for a topic, one tweet at a time.
+# The client must be built with return_type=requests.Response so the rate-limit headers are visible.
+# start_time (a Unix timestamp) makes the API stop paging at that point instead of going back 7 days.
+def iter_recent_tweets(client, topic, max_tweets=10000, page_size=100, since_id=None, budget=None, start_time=None):
+    # The caller already built a tweepy client, so this costs nothing; the counting code doesn't need tweepy
+    import tweepy
+
+    query = f"{topic} -is:retweet"
+    if start_time is not None:
+        start_time = datetime.fromtimestamp(start_time, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    next_token = None
+    fetched = 0
+    while fetched < max_tweets:
+        if budget:
+            budget.acquire(SEARCH_ENDPOINT)
+        try:
+            response = client.search_recent_tweets(
+                query=query,
+                max_results=max(10, min(page_size, max_tweets - fetched)),
+                next_token=next_token,
+                since_id=since_id,
+                start_time=start_time,
+                tweet_fields=["created_at"],
+            )
+        except tweepy.TooManyRequests as e:
+            if not budget:
+                raise
+            # Let the budget decide whether to wait for the reset or defer the call
+            budget.exhaust(SEARCH_ENDPOINT, e.response.headers)
+            continue
+        if budget:
+            budget.update(SEARCH_ENDPOINT, response.headers)
+
+        body = response.json()
+        for tweet in body.get("data") or []:
+            fetched += 1
+            yield tweet
+            if fetched >= max_tweets:
+                return
+        next_token = (body.get("meta") or {}).get("next_token")
+        if not next_token:
+            return
+
+
+# Function to pull hashtags and word n-grams out of a tweet
+def extract_terms(text, ngram_sizes=(1, 2)):
+    text = MENTION_RE.sub(" ", URL_RE.sub(" ", text.lower()))
+    terms = {f"#{tag}" for tag in HASHTAG_RE.findall(text)}
+    words = WORD_RE.findall(HASHTAG_RE.sub(" ", text))
+    for n in ngram_sizes:
+        for i in range(len(words) - n + 1):
+            gram = words[i:i + n]
+            # Skip n-grams that start or end on a stopword
+            if gram[0] in STOPWORDS or gram[-1] in STOPWORDS:
+                continue
+            terms.add(" ".join(gram))
+    return terms
+
+
+# Fixed-size approximate counter, memory does not grow with the number of terms
+class CountMinSketch:
+    def __init__(self, width=2048, depth=4):
+        self.width = width
+        self.depth = depth
+        self.rows = [array("l", [0]) * width for _ in range(depth)]
+
+    def _columns(self, item):
+        # A stable hash, so sketches saved by one process can be read by another
+        digest = hashlib.blake2b(item.encode(), digest_size=4 * self.depth).digest()
+        return [int.from_bytes(digest[4 * row:4 * row + 4], "little") % self.width for row in range(self.depth)]
+
+    def add(self, item, count=1):
+        for row, column in zip(self.rows, self._columns(item)):
+            row[column] += count
+
+    def estimate(self, item):
+        return min(row[column] for row, column in zip(self.rows, self._columns(item)))
+
+    # A bucket's rows are mostly zeros, so they're pickled compressed: a few KB instead of 64 KB
+    def __getstate__(self):
+        return {"width": self.width, "depth": self.depth, "rows": zlib.compress(b"".join(row.tobytes() for row in self.rows))}
+
+    def __setstate__(self, state):
+        self.width = state["width"]
+        self.depth = state["depth"]
+        data = array("l")
+        data.frombytes(zlib.decompress(state["rows"]))
+        self.rows = [data[row * self.width:(row + 1) * self.width] for row in range(self.depth)]
+
+
+# Sliding-window term counts made of one sketch per time bucket, plus a bounded top-k candidate set
+class SlidingWindowCounter:
+    def __init__(self, window_seconds=3600, bucket_seconds=300, k=10, width=2048, depth=4):
+        self.bucket_seconds = bucket_seconds
+        self.num_buckets = max(1, window_seconds // bucket_seconds)
+        self.k = k
+        self.width = width
+        self.depth = depth
+        self.buckets = {}
+        self.capacity = k * 5
+        self._candidates = {}
+        self._heap = []
+
+    @property
+    def window_seconds(self):
+        return self.num_buckets * self.bucket_seconds
+
+    def _bucket(self, timestamp):
+        return int(timestamp // self.bucket_seconds)
+
+    def _expire(self, current_bucket):
+        oldest = current_bucket - self.num_buckets + 1
+        for bucket in [b for b in self.buckets if b < oldest]:
+            del self.buckets[bucket]
+
+    # Function to drop buckets that have slid out of the window as of now
+    def expire(self, timestamp=None):
+        self._expire(self._bucket(time.time() if timestamp is None else timestamp))
+
+    def add(self, term, timestamp=None):
+        bucket = self._bucket(time.time() if timestamp is None else timestamp)
+        if bucket not in self.buckets:
+            self.buckets[bucket] = CountMinSketch(self.width, self.depth)
+            self._expire(max(self.buckets))
+            if bucket not in self.buckets:
+                # Older than the window, nothing to count
+                return
+        self.buckets[bucket].add(term)
+        self._offer(term, self.estimate(term))
+
+    def estimate(self, term):
+        return sum(sketch.estimate(term) for sketch in self.buckets.values())
+
+    def _offer(self, term, count):
+        if term in self._candidates or len(self._candidates) < self.capacity:
+            self._candidates[term] = count
+            heapq.heappush(self._heap, (count, term))
+        elif count > self._peek_min()[0]:
+            _, evicted = heapq.heappop(self._heap)
+            del self._candidates[evicted]
+            self._candidates[term] = count
+            heapq.heappush(self._heap, (count, term))
+        # Stale heap entries pile up as counts change, rebuild before they outgrow the candidate set
+        if len(self._heap) > self.capacity * 4:
+            self._heap = [(count, term) for term, count in self._candidates.items()]
+            heapq.heapify(self._heap)
+
+    def _peek_min(self):
+        # Lazily drop heap entries that no longer match the candidate's current count
+        while self._heap:
+            count, term = self._heap[0]
+            if self._candidates.get(term) == count:
+                return self._heap[0]
+            heapq.heappop(self._heap)
+        return (0, None)
+
+    def top(self, k=None, exclude=()):
+        k = k or self.k
+        # Re-estimate on read so expired buckets are reflected
+        counts = [(self.estimate(term), term) for term in self._candidates if term not in exclude]
+        return [(term, count) for count, term in heapq.nlargest(k, counts) if count > 0]
+
+
+# Function to turn a tweet's ISO created_at into a timestamp
+def tweet_timestamp(tweet):
+    created_at = tweet.get("created_at")
+    if not created_at:
+        return None
+    return datetime.fromisoformat(created_at.replace("Z", "+00:00")).timestamp()
+
+
+# Function to stream tweets into a counter, returns the newest tweet id seen
+def ingest_tweets(client, topic, counter, max_tweets=10000, since_id=None, budget=None):
+    start = time.monotonic()
+    seen = 0
+    newest_id = None
+    # Tweets older than the window would be dropped by the counter anyway, so don't page back to them
+    start_time = time.time() - counter.window_seconds
+    try:
+        for tweet in iter_recent_tweets(client, topic, max_tweets=max_tweets, since_id=since_id, budget=budget, start_time=start_time):
+            timestamp = tweet_timestamp(tweet)
+            for term in extract_terms(tweet["text"]):
+                counter.add(term, timestamp)
+            if newest_id is None or int(tweet["id"]) > int(newest_id):
+                newest_id = tweet["id"]
+            seen += 1
+    except RateLimitDeferred as e:
+        # Keep whatever we counted, the next poll picks up from the cursor
+        logging.warning(f"Stopped reading tweets for '{topic}': {e}")
+    logging.info(f"Counted {seen} tweets for '{topic}' in {time.monotonic() - start:.2f}s")
+    return newest_id
+
+
+# Function to get the text of a topic's latest tweets whenever they were posted, in one request.
+# Used when a quiet topic has nothing inside the counting window.
+def latest_tweet_texts(client, topic, count=10, budget=None):
+    try:
+        return [tweet["text"] for tweet in iter_recent_tweets(client, topic, max_tweets=count, page_size=count, budget=budget)]
+    except RateLimitDeferred as e:
+        logging.warning(f"Could not read the latest tweets for '{topic}': {e}")
+        return []
+
+
+# Function to rank the counted terms, leaving out the topic itself
+def rank_trends(counter, topic, k=10):
+    counter.expire()
+    # The topic itself shows up in every tweet, so it's never a trend
+    topic_terms = extract_terms(topic, ngram_sizes=(1, 2, 3)) | {topic.lower()}
+    return [term for term, _ in counter.top(k, exclude=topic_terms)]
+
+
+# Function to stream tweets for a topic and return its top trending hashtags and phrases
+def top_trends(client, topic, k=10, max_tweets=10000, window_seconds=3600, budget=None):
+    counter = SlidingWindowCounter(window_seconds=window_seconds, k=k)
+    ingest_tweets(client, topic, counter, max_tweets=max_tweets, budget=budget)
+    return rank_trends(counter, topic, k)
@@ -0,0 +1,145 @@
+import hashlib
+import logging
+import os
+import pickle
+import threading
+import time
+
+from app.trend_cache import normalize_topic
+
+CURSOR_DIR = os.getenv("TWITTER_CURSOR_DIR", os.path.join(".cache", "twitter_cursors"))
+
+# The recent search endpoint only accepts a since_id from the last 7 days
+MAX_CURSOR_AGE = 6 * 24 * 60 * 60
+
+# Topics kept on disk at most, the least recently polled are dropped first
+MAX_CURSOR_ENTRIES = int(os.getenv("TWITTER_CURSOR_MAX_ENTRIES", "1000"))
+
+
+# Raised when a call would have to wait longer than the caller allows
+class RateLimitDeferred(Exception):
+    def __init__(self, endpoint, retry_at):
+        super().__init__(f"Rate limit for {endpoint} exhausted until {time.ctime(retry_at)}")
+        self.endpoint = endpoint
+        self.retry_at = retry_at
+
+
+# Tracks the 15-minute rate-limit window per endpoint from the x-rate-limit-* response headers
+class RateLimitBudget:
+    def __init__(self, reserve=1, max_wait=60):
+        self.reserve = reserve
+        self.max_wait = max_wait
+        self._windows = {}
+        self._lock = threading.Lock()
+
+    # Function to record the limits the API reported on its last response
+    def update(self, endpoint, headers):
+        try:
+            window = {
+                "limit": int(headers["x-rate-limit-limit"]),
+                "remaining": int(headers["x-rate-limit-remaining"]),
+                "reset": float(headers["x-rate-limit-reset"]),
+            }
+        except (KeyError, TypeError, ValueError):
+            return
+        with self._lock:
+            self._windows[endpoint] = window
+
+    # Function to mark an endpoint as exhausted after a 429
+    def exhaust(self, endpoint, headers=None):
+        reset = None
+        try:
+            reset = float((headers or {})["x-rate-limit-reset"])
+        except (KeyError, TypeError, ValueError):
+            pass
+        with self._lock:
+            window = self._windows.setdefault(endpoint, {"limit": 0, "remaining": 0, "reset": 0})
+            window["remaining"] = 0
+            window["reset"] = reset or max(window["reset"], time.time() + 15 * 60)
+
+    def remaining(self, endpoint):
+        with self._lock:
+            window = self._windows.get(endpoint)
+            if window is None or window["reset"] <= time.time():
+                return None
+            return window["remaining"]
+
+    # Function to take one call from the budget, waiting for the window to reset if needed
+    def acquire(self, endpoint, max_wait=None):
+        max_wait = self.max_wait if max_wait is None else max_wait
+        while True:
+            with self._lock:
+                window = self._windows.get(endpoint)
+                now = time.time()
+                if window is None or window["reset"] <= now:
+                    # Unknown or expired window, the next response will tell us where we stand
+                    return
+                if window["remaining"] > self.reserve:
+                    window["remaining"] -= 1
+                    return
+                wait_for = window["reset"] - now + 1
+                retry_at = window["reset"]
+            if wait_for > max_wait:
+                raise RateLimitDeferred(endpoint, retry_at)
+            logging.info(f"Rate limit for {endpoint} nearly spent, waiting {wait_for:.0f}s for reset")
+            time.sleep(wait_for)
+
+
+# Per-topic since_id cursor plus the sliding-window counts it was built from
+class TopicCursorStore:
+    def __init__(self, cursor_dir=CURSOR_DIR, max_entries=MAX_CURSOR_ENTRIES):
+        self.cursor_dir = cursor_dir
+        self.max_entries = max_entries
+        self._writes = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.cursor_dir, exist_ok=True)
+
+    def _path(self, topic):
+        key = hashlib.sha256(normalize_topic(topic).encode()).hexdigest()
+        return os.path.join(self.cursor_dir, f"{key}.pkl")
+
+    # Function to load (since_id, counter) for a topic, or (None, None) if there is no usable cursor
+    def load(self, topic):
+        try:
+            with open(self._path(topic), "rb") as f:
+                cursor = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            return None, None
+        if time.time() - cursor.get("updated_at", 0) > MAX_CURSOR_AGE:
+            return None, None
+        return cursor.get("since_id"), cursor.get("counter")
+
+    def save(self, topic, since_id, counter):
+        path = self._path(topic)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        # Buckets that slid out of the window would only be dropped on the next load
+        counter.expire()
+        cursor = {"since_id": since_id, "counter": counter, "updated_at": time.time()}
+        try:
+            with open(tmp_path, "wb") as f:
+                pickle.dump(cursor, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logging.warning(f"Could not save Twitter cursor for '{topic}': {e}")
+            return
+        with self._lock:
+            self._writes += 1
+            check_size = self._writes % 32 == 1
+        if check_size:
+            self._evict()
+
+    # Function to drop cursors too old to use, then the least recently saved ones past the cap
+    def _evict(self):
+        try:
+            names = [n for n in os.listdir(self.cursor_dir) if n.endswith(".pkl")]
+        except OSError:
+            return
+        paths = [os.path.join(self.cursor_dir, n) for n in names]
+        paths.sort(key=lambda p: os.path.getmtime(p) if os.path.exists(p) else 0)
+        cutoff = time.time() - MAX_CURSOR_AGE
+        expired = [p for p in paths if os.path.exists(p) and os.path.getmtime(p) < cutoff]
+        for path in set(expired) | set(paths[:max(0, len(paths) - self.max_entries)]):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
@@ -1,12 +1,22 @@
 import streamlit as st
-from clients.youtube import YoutubeClient
+from app.publish_queue import get_publish_queue, DONE, FAILED
 
 def upload_video(video_url):
+    publish_queue = get_publish_queue()
     # Ask the user to confirm the upload to YouTube
     if st.button("Confirm and Upload to YouTube"):
-        # Initialize the YoutubeClient
-        youtube_client = YoutubeClient(st.session_state['YOUTUBE_API_KEY'])
-        youtube_client.authenticate()
-        # Upload the video to YouTube
-        youtube_client.upload_video(video_url, "Generated Video", "This video was generated using AI.", st.session_state['YOUTUBE_VIDEO_CATEGORY'], ["AI", "Generated Video"])
-        st.success("Video uploaded successfully to YouTube!")
+        # Queue the upload, it goes out as soon as a channel has quota for it
+        job_id = publish_queue.submit(video_url, "Generated Video", "This video was generated using AI.", st.session_state['YOUTUBE_VIDEO_CATEGORY'], ["AI", "Generated Video"])
+        st.session_state.setdefault('upload_jobs', []).append(job_id)
+        st.success("Video queued for upload to YouTube!")
+
+    for job_id in reversed(st.session_state.get('upload_jobs', [])):
+        job = publish_queue.get(job_id)
+        if job is None:
+            continue
+        if job["state"] == DONE:
+            st.write(f"Uploaded to YouTube: https://youtu.be/{job['response']['id']}")
+        elif job["state"] == FAILED:
+            st.error(f"Upload failed: {job['error']}")
+        else:
+            st.write(f"Upload {job['state']}: {job['video_url']}")
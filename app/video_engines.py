@@ -0,0 +1,269 @@
+# Video engines behind one async submit/poll contract, and a router that picks between them
+import asyncio
+import logging
+import threading
+import time
+
+from clients.heygen import submit_heygen_video, get_heygen_video_status
+from app.job_store import callback_url
+from app.render_poller import poll_render, wait_for_render, render_times
+
+# How many renders each engine may run at once
+DEFAULT_ENGINE_LIMITS = {"D-ID": 4, "Heygen": 2}
+DEFAULT_ENGINE_LIMIT = 2
+
+# An engine that fails this many times in a row sits out for the cooldown (seconds)
+MAX_CONSECUTIVE_FAILURES = 3
+FAILURE_COOLDOWN = 5 * 60
+
+# Preference value that lets the router choose freely
+AUTO = "Auto"
+
+
+# Raised when an engine didn't accept a render, so nothing was started and another engine can safely take it
+class RenderSubmitError(Exception):
+    pass
+
+
+class VideoEngine:
+    name = None
+    # Whether submit can ask the engine to notify the /render-callback route when a render finishes
+    supports_callbacks = False
+
+    # Function to start a render, returns (the engine's job id, whether a completion callback was registered)
+    async def submit(self, script, source_url):
+        raise NotImplementedError
+
+    # Function to check a render once, returns (status, result_url)
+    async def poll(self, job_id):
+        raise NotImplementedError
+
+
+class DIdEngine(VideoEngine):
+    name = "D-ID"
+    supports_callbacks = True
+
+    def __init__(self, client):
+        self.client = client
+
+    async def submit(self, script, source_url):
+        webhook_url = callback_url(self.name)
+        # The client is blocking, keep it off the event loop
+        talk = await asyncio.to_thread(self.client.create_talk, source_url, script, webhook_url)
+        talk_id = talk.get("id")
+        if not talk_id:
+            raise RuntimeError(f"Failed to create talk. No valid Talk ID returned: {talk}")
+        return talk_id, webhook_url is not None
+
+    async def poll(self, job_id):
+        return await asyncio.to_thread(self.client.get_talk_status, job_id)
+
+
+class HeyGenEngine(VideoEngine):
+    name = "Heygen"
+
+    def __init__(self, api_key, avatar_id, endpoint="https://api.heygen.com/v1/video.generate"):
+        self.api_key = api_key
+        self.avatar_id = avatar_id
+        self.endpoint = endpoint
+
+    async def submit(self, script, source_url):
+        # HeyGen renders its own avatar, so the source image isn't used
+        video_id = await asyncio.to_thread(submit_heygen_video, script, self.api_key, self.avatar_id, self.endpoint)
+        if not video_id:
+            raise RuntimeError("Failed to create HeyGen video. No video ID returned.")
+        # The submit request doesn't register a callback, so HeyGen renders are always polled
+        return video_id, False
+
+    async def poll(self, job_id):
+        return await asyncio.to_thread(get_heygen_video_status, job_id, self.api_key)
+
+
+# Rolling health numbers for one engine
+class EngineStats:
+    def __init__(self, alpha=0.3):
+        self.alpha = alpha
+        self.queue_seconds = 0.0
+        self.error_rate = 0.0
+        self.consecutive_failures = 0
+        self.unhealthy_until = 0.0
+        self.in_flight = 0
+
+    def _average(self, previous, value):
+        return (1 - self.alpha) * previous + self.alpha * value
+
+    def record_queue(self, seconds):
+        self.queue_seconds = self._average(self.queue_seconds, seconds)
+
+    def record_result(self, ok):
+        self.error_rate = self._average(self.error_rate, 0.0 if ok else 1.0)
+        if ok:
+            self.consecutive_failures = 0
+        else:
+            self.consecutive_failures += 1
+            if self.consecutive_failures >= MAX_CONSECUTIVE_FAILURES:
+                self.unhealthy_until = time.time() + FAILURE_COOLDOWN
+
+    def healthy(self):
+        return time.time() >= self.unhealthy_until
+
+    def snapshot(self):
+        return {
+            "queue_seconds": self.queue_seconds,
+            "error_rate": self.error_rate,
+            "consecutive_failures": self.consecutive_failures,
+            "healthy": self.healthy(),
+            "in_flight": self.in_flight,
+        }
+
+
+# Sends each render to the fastest healthy engine and fails over when one degrades
+class EngineRouter:
+    def __init__(self, engines, job_store, engine_limits=None, timeout=600):
+        self.engines = {engine.name: engine for engine in engines}
+        self.job_store = job_store
+        self.timeout = timeout
+        limits = dict(DEFAULT_ENGINE_LIMITS, **(engine_limits or {}))
+        self._slots = {name: threading.BoundedSemaphore(limits.get(name, DEFAULT_ENGINE_LIMIT)) for name in self.engines}
+        self.stats = {name: EngineStats() for name in self.engines}
+        self._lock = threading.Lock()
+
+    # Function to estimate how long a render would take end to end on an engine
+    def expected_seconds(self, name, script_length):
+        stats = self.stats[name]
+        render = render_times.expected_seconds(name, script_length)
+        # Errors cost a failover, so an unreliable engine looks slower than it is
+        return (stats.queue_seconds + render) * (1 + 2 * stats.error_rate)
+
+    # Function to order engines to try: the preferred one first if it's healthy, then fastest first.
+    # Unhealthy engines go last rather than being dropped, in case every engine is struggling.
+    def candidates(self, script_length, preferred=AUTO):
+        with self._lock:
+            ranked = sorted(
+                self.engines,
+                key=lambda name: (not self.stats[name].healthy(), self.expected_seconds(name, script_length))
+            )
+            if preferred in self.engines and self.stats[preferred].healthy():
+                ranked.remove(preferred)
+                ranked.insert(0, preferred)
+        return ranked
+
+    def _record(self, name, ok):
+        with self._lock:
+            self.stats[name].record_result(ok)
+
+    def health(self):
+        with self._lock:
+            return {name: stats.snapshot() for name, stats in self.stats.items()}
+
+    # Function to render on one engine, reusing an identical in-flight job if there is one
+    async def _render_on(self, engine, script, source_url):
+        existing = self.job_store.find_reusable(engine.name, script, source_url)
+        if existing:
+            job_id = existing["job_id"]
+            # Whether it was submitted with a callback isn't recorded, so only count on one if this engine sends them
+            has_callback = engine.supports_callbacks and callback_url(engine.name) is not None
+            logging.info(f"Resuming in-flight {engine.name} render {job_id}")
+        else:
+            try:
+                job_id, has_callback = await engine.submit(script, source_url)
+            except Exception as e:
+                raise RenderSubmitError(f"{engine.name} didn't accept the render: {e}") from e
+            logging.info(f"Submitted {engine.name} render {job_id}")
+            try:
+                self.job_store.create(engine.name, job_id, script, source_url)
+            except Exception as e:
+                # The render is already paid for, so wait on it anyway; settling it below writes the row
+                logging.warning(f"Could not record {engine.name} render {job_id}: {e}")
+        return await self._await_render(engine, job_id, script, has_callback)
+
+    # Function to wait for a submitted render to finish, returns its URL or None if the engine reports it failed
+    async def _await_render(self, engine, job_id, script, has_callback):
+        video_url = None
+        try:
+            fetch_status = lambda: engine.poll(job_id)
+            if has_callback:
+                # Wait for the webhook, polling the engine only as a fallback
+                video_url = await wait_for_render(self.job_store, engine.name, job_id, fetch_status, len(script), timeout=self.timeout)
+            else:
+                video_url = await poll_render(fetch_status, engine.name, len(script), timeout=self.timeout)
+        finally:
+            # Settle the job however the wait ended, so it's neither resumed nor reused if it didn't produce a video
+            try:
+                if video_url:
+                    self.job_store.update(engine.name, job_id, "done", video_url)
+                else:
+                    self.job_store.update(engine.name, job_id, "failed", error="Render failed or timed out")
+            except Exception as e:
+                logging.warning(f"Could not settle {engine.name} render {job_id}: {e}")
+        return video_url
+
+    # Function to wait on a render started before a restart, blocking the calling worker thread.
+    # It's the recorded job on its recorded engine or nothing: the source may have been overwritten
+    # or wiped since, so it's never submitted again, here or on another engine.
+    def resume(self, name, job_id, script, report=lambda **changes: None):
+        engine = self.engines.get(name)
+        if engine is None:
+            self.job_store.update(name, job_id, "failed", error=f"{name} is no longer configured")
+            return None
+        # Whether it was submitted with a callback isn't recorded, so only count on one if this engine sends them
+        has_callback = engine.supports_callbacks and callback_url(name) is not None
+        report(engine=name)
+        with self._slots[name]:
+            with self._lock:
+                self.stats[name].in_flight += 1
+            report(state="running", started_at=time.time())
+            logging.info(f"Resuming {name} render {job_id}")
+            try:
+                video_url = asyncio.run(self._await_render(engine, job_id, script or "", has_callback))
+            except Exception:
+                self._record(name, False)
+                raise
+            finally:
+                with self._lock:
+                    self.stats[name].in_flight -= 1
+        self._record(name, bool(video_url))
+        return video_url
+
+    # Function to render a script, blocking the calling worker thread until it's done.
+    # report(**changes) is called as the job moves between engines and states.
+    # Only a render an engine refused or reported failed moves on to the next engine: once one has
+    # started, a timeout or any other error ends the render rather than paying for it twice.
+    def render(self, script, source_url, preferred=AUTO, report=lambda **changes: None):
+        # A finished render of the same script and source on any engine is as good as a new one
+        for name in self.engines:
+            existing = self.job_store.find_reusable(name, script, source_url)
+            if existing and existing["status"] in ("done", "completed") and existing["result_url"]:
+                logging.info(f"Reusing finished {name} render {existing['job_id']}")
+                report(engine=name)
+                return existing["result_url"]
+
+        last_error = None
+        for name in self.candidates(len(script), preferred):
+            engine = self.engines[name]
+            report(engine=name)
+            queued_at = time.monotonic()
+            with self._slots[name]:
+                with self._lock:
+                    self.stats[name].record_queue(time.monotonic() - queued_at)
+                    self.stats[name].in_flight += 1
+                report(state="running", started_at=time.time())
+                try:
+                    video_url = asyncio.run(self._render_on(engine, script, source_url))
+                except RenderSubmitError as e:
+                    logging.warning(str(e))
+                    video_url, last_error = None, e
+                except Exception:
+                    self._record(name, False)
+                    raise
+                finally:
+                    with self._lock:
+                        self.stats[name].in_flight -= 1
+            self._record(name, bool(video_url))
+            if video_url:
+                return video_url
+            logging.warning(f"Failing over from {name}")
+
+        if last_error:
+            raise last_error
+        return None
@@ -0,0 +1,101 @@
+# Headless batch runner: puts every topic in a file through the content pipeline, no Streamlit session needed.
+#   python batch.py topics.txt --concurrency 8 --stages trends,script,video,upload
+import argparse
+import json
+import logging
+import sys
+import time
+from concurrent.futures import as_completed
+
+from workflow import build_pipeline, CONTENT_STAGES, WORKFLOW_STAGES
+
+logging.basicConfig(level=logging.INFO)
+
+# Settings the settings page saves, used unless overridden on the command line
+SETTINGS_PATH = "settings.json"
+
+
+def load_topics(path):
+    with open(path, "r") as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+def load_settings(path):
+    try:
+        with open(path, "r") as f:
+            settings = json.load(f)
+    except (OSError, ValueError):
+        logging.warning(f"Could not read {path}, using defaults")
+        settings = {}
+    settings.setdefault("trend_engine", "GPT")
+    settings.setdefault("video_engine", "D-ID")
+    settings.setdefault("last_uploaded_image", "")
+    return settings
+
+
+def format_seconds(seconds):
+    return "-" if seconds is None else f"{seconds:.2f}s"
+
+
+def print_report(pipeline, succeeded, failed, elapsed):
+    print(f"\n{succeeded} succeeded, {failed} failed in {elapsed:.1f}s "
+          f"({succeeded / (elapsed / 60) if elapsed else 0:.1f} jobs/min)")
+    print(f"{'stage':<10}{'ran':>6}{'reused':>8}{'p50':>10}{'p95':>10}")
+    for name, stats in pipeline.stats().items():
+        print(f"{name:<10}{stats['count']:>6}{stats['reused']:>8}{format_seconds(stats['p50']):>10}{format_seconds(stats['p95']):>10}")
+
+
+def main():
+    stage_names = [stage.name for stage in CONTENT_STAGES]
+    parser = argparse.ArgumentParser(description="Run the content pipeline for every topic in a file.")
+    parser.add_argument("topics", help="file with one topic per line")
+    parser.add_argument("--concurrency", type=int, default=4, help="jobs each stage works on at once")
+    parser.add_argument("--stages", default=",".join(WORKFLOW_STAGES), help=f"comma-separated, from {','.join(stage_names)}")
+    parser.add_argument("--settings", default=SETTINGS_PATH)
+    parser.add_argument("--trend-engine")
+    parser.add_argument("--video-engine")
+    parser.add_argument("--source", help="source image for the video stage")
+    parser.add_argument("--output", help="write one JSON result per topic to this file")
+    args = parser.parse_args()
+
+    stages = tuple(name.strip() for name in args.stages.split(","))
+    unknown = [name for name in stages if name not in stage_names]
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(unknown)}")
+
+    settings = load_settings(args.settings)
+    for key, value in (("trend_engine", args.trend_engine), ("video_engine", args.video_engine), ("last_uploaded_image", args.source)):
+        if value:
+            settings[key] = value
+
+    topics = load_topics(args.topics)
+    pipeline = build_pipeline(stages, workers=args.concurrency)
+    logging.info(f"Running {len(topics)} topics through {', '.join(stages)} with concurrency {args.concurrency}")
+
+    started = time.monotonic()
+    futures = {pipeline.submit(query=topic, settings=dict(settings)): topic for topic in topics}
+    succeeded = failed = 0
+    output = open(args.output, "w") if args.output else None
+    try:
+        for future in as_completed(futures):
+            topic = futures[future]
+            try:
+                context = future.result()
+                result = {"topic": topic, **{name: context[name] for name in stages}, "error": None}
+                succeeded += 1
+            except Exception as e:
+                result = {"topic": topic, "error": str(e)}
+                failed += 1
+            if output:
+                output.write(json.dumps(result, default=str) + "\n")
+                output.flush()
+    finally:
+        if output:
+            output.close()
+
+    print_report(pipeline, succeeded, failed, time.monotonic() - started)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+# Import-time budget check: fails when an entry module gets slow to import or starts loading a heavy SDK
+# that should only be loaded on first use. Each module is imported in a fresh interpreter.
+#   python check_import_time.py [--scale 1.5] [module ...]
+import argparse
+import subprocess
+import sys
+
+# Seconds each entry point may spend importing, on a warm disk cache
+IMPORT_BUDGETS = {
+    "app.get_trends": 1.5,
+    "app.generate_video": 1.5,
+    "app.upload_video": 1.0,
+    "workflow": 2.0,
+    "batch": 2.0,
+    "scheduler_worker": 0.5,
+    "flask_app": 1.0,
+}
+
+# SDKs and clients that must only be imported when they're first used
+LAZY_MODULES = ("tweepy", "googleapiclient", "google_auth_oauthlib", "stripe", "mysql")
+
+# Entry points that run without a UI, and so must not load Streamlit at all
+HEADLESS_MODULES = ("workflow", "batch", "scheduler_worker")
+
+
+# Function to import a module in a fresh interpreter, returns (seconds, {imported module: cumulative seconds})
+def measure_import(module):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr.strip().splitlines()[-1]}")
+    total = 0
+    imported = {}
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        total += int(self_us)
+        imported[name.strip()] = int(cumulative_us) / 1e6
+    return total / 1e6, imported
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check entry modules import within their time budget.")
+    parser.add_argument("modules", nargs="*", default=list(IMPORT_BUDGETS))
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply every budget, e.g. on a slow machine")
+    args = parser.parse_args()
+
+    failures = 0
+    for module in args.modules:
+        budget = IMPORT_BUDGETS.get(module, 1.0) * args.scale
+        try:
+            seconds, imported = measure_import(module)
+        except RuntimeError as e:
+            print(f"ERROR {module}: {e}")
+            failures += 1
+            continue
+        lazy = LAZY_MODULES + (("streamlit",) if module in HEADLESS_MODULES else ())
+        eager = sorted(name for name in imported if name.split(".")[0] in lazy and "." not in name)
+        slowest = sorted(
+            ((name, cumulative) for name, cumulative in imported.items() if "." not in name and name != module),
+            key=lambda item: item[1], reverse=True
+        )[:3]
+        ok = seconds <= budget and not eager
+        failures += not ok
+        print(f"{'ok  ' if ok else 'FAIL'} {module}: {seconds:.2f}s of {budget:.2f}s"
+              f" (slowest: {', '.join(f'{name} {cumulative:.2f}s' for name, cumulative in slowest)})")
+        if eager:
+            print(f"     loads {', '.join(eager)} at import, it should be imported on first use")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
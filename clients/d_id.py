@@ -1,5 +1,17 @@
 # Import necessary library
-import requests
+import hashlib
+import io
+import json
+import os
+import threading
+from PIL import Image
+from clients.http import get_http_session
+
+# Where hosted URLs of uploaded source images are remembered, keyed by the file's content hash
+UPLOAD_CACHE_PATH = os.getenv("D_ID_UPLOAD_CACHE", os.path.join(".cache", "d_id_uploads.json"))
+
+# Longest side D-ID makes use of for a talking-head source image
+MAX_SOURCE_SIZE = 1024
 
 # Define DIdClient class
 class DIdClient:
@@ -11,10 +23,65 @@ class DIdClient:
             "Authorization": f"Basic {self.api_key}",
             "Content-Type": "application/json"
         }
+        # Shared keep-alive session, so polling doesn't pay a new handshake per request
+        self.http = get_http_session("d-id")
+        self._upload_lock = threading.Lock()
+
+    def _load_upload_cache(self):
+        try:
+            with open(UPLOAD_CACHE_PATH, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_upload_cache(self, cache):
+        os.makedirs(os.path.dirname(UPLOAD_CACHE_PATH) or ".", exist_ok=True)
+        tmp_path = f"{UPLOAD_CACHE_PATH}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(cache, f)
+        os.replace(tmp_path, UPLOAD_CACHE_PATH)
+
+    # Function to shrink and re-encode a source image to what D-ID actually uses
+    def _prepare_image(self, data):
+        image = Image.open(io.BytesIO(data)).convert("RGB")
+        image.thumbnail((MAX_SOURCE_SIZE, MAX_SOURCE_SIZE))
+        output = io.BytesIO()
+        image.save(output, "JPEG", quality=90, optimize=True)
+        return output.getvalue()
+
+    # Function to upload a local image once and return its hosted URL
+    def upload_image(self, file_path):
+        with open(file_path, "rb") as f:
+            data = f.read()
+        content_hash = hashlib.sha256(data).hexdigest()
+        with self._upload_lock:
+            hosted_url = self._load_upload_cache().get(content_hash)
+        if hosted_url:
+            return hosted_url
+
+        image = self._prepare_image(data)
+        # Multipart upload, so let requests set the Content-Type
+        headers = {"Authorization": self.headers["Authorization"]}
+        response = self.http.post(
+            f"{self.base_url}/images",
+            headers=headers,
+            files={"image": (f"{content_hash[:16]}.jpg", image, "image/jpeg")},
+            endpoint="POST /images"
+        )
+        response.raise_for_status()
+        hosted_url = response.json()["url"]
+        with self._upload_lock:
+            cache = self._load_upload_cache()
+            cache[content_hash] = hosted_url
+            self._save_upload_cache(cache)
+        return hosted_url
 
     # Function to create a talk
-    def create_talk(self, source_url, script_text):
+    def create_talk(self, source_url, script_text, webhook_url=None):
         endpoint = "/talks"
+        # D-ID can't read local paths, upload the file and use its hosted URL
+        if os.path.isfile(source_url):
+            source_url = self.upload_image(source_url)
         payload = {
             "source_url": source_url,
             "script": {
@@ -22,25 +89,33 @@ class DIdClient:
                 "input": script_text
             }
         }
+        # D-ID POSTs the finished talk to this URL
+        if webhook_url:
+            payload["webhook"] = webhook_url
         # Send POST request to create a talk
-        response = requests.post(f"{self.base_url}{endpoint}", headers=self.headers, json=payload)
+        response = self.http.post(f"{self.base_url}{endpoint}", headers=self.headers, json=payload, endpoint="POST /talks")
         return response.json()
 
     # Function to get a talk
     def get_talk(self, talk_id):
         endpoint = f"/talks/{talk_id}"
         # Send GET request to retrieve a talk
-        response = requests.get(f"{self.base_url}{endpoint}", headers=self.headers)
+        response = self.http.get(f"{self.base_url}{endpoint}", headers=self.headers, endpoint="GET /talks/{id}")
         return response.json()
 
+    # Function to get a talk's status and result URL with a single request
+    def get_talk_status(self, talk_id):
+        talk_data = self.get_talk(talk_id)
+        return talk_data.get("status"), talk_data.get("result_url")
+
     # Function to check if a video is ready
     def is_video_ready(self, talk_id):
-        talk_data = self.get_talk(talk_id)
-        return talk_data.get("status") == "done"
+        status, _ = self.get_talk_status(talk_id)
+        return status == "done"
 
     # Function to get a video URL
     def get_video_url(self, talk_id):
-        talk_data = self.get_talk(talk_id)
-        return talk_data.get("result_url") if self.is_video_ready(talk_id) else None
+        status, result_url = self.get_talk_status(talk_id)
+        return result_url if status == "done" else None
 
 
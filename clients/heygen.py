@@ -1,15 +1,15 @@
 # Import necessary library
-import requests
+from clients.http import get_http_session
 
-# Function to create a Heygen video
-def create_heygen_video(script, HEYGEN_API_KEY, avatar_id, HEYGEN_API_ENDPOINT):
-    # Define headers
-    headers = {
+HEYGEN_STATUS_ENDPOINT = "https://api.heygen.com/v1/video_status.get"
+
+def heygen_headers(HEYGEN_API_KEY):
+    return {
         "Content-Type": "application/json",
         "X-Api-Key": HEYGEN_API_KEY
     }
-    
-    # Define data
+
+def heygen_video_data(script, avatar_id):
     data = {
         "background": "#FAFAFA",
         "ratio": "16:9",
@@ -24,12 +24,44 @@ def create_heygen_video(script, HEYGEN_API_KEY, avatar_id, HEYGEN_API_ENDPOINT):
             }
         ]
     }
+    return data
+
+# Function to create a Heygen video
+def create_heygen_video(script, HEYGEN_API_KEY, avatar_id, HEYGEN_API_ENDPOINT):
+    # Define headers
+    headers = heygen_headers(HEYGEN_API_KEY)
+    
+    # Define data
+    data = heygen_video_data(script, avatar_id)
     
     # Send POST request to create a video
-    response = requests.post(HEYGEN_API_ENDPOINT, headers=headers, json=data)
+    response = get_http_session("heygen").post(HEYGEN_API_ENDPOINT, headers=headers, json=data, endpoint="POST video.generate")
     
     # Return video URL if successful, else return None
     if response.status_code == 200:
         return response.json().get("video_url")
     else:
         return None
+
+
+# Function to start a Heygen render, returns its video id
+def submit_heygen_video(script, HEYGEN_API_KEY, avatar_id, HEYGEN_API_ENDPOINT):
+    response = get_http_session("heygen").post(
+        HEYGEN_API_ENDPOINT,
+        headers=heygen_headers(HEYGEN_API_KEY),
+        json=heygen_video_data(script, avatar_id),
+        endpoint="POST video.generate"
+    )
+    response.raise_for_status()
+    return (response.json().get("data") or {}).get("video_id")
+
+# Function to get a Heygen render's status and video URL with a single request
+def get_heygen_video_status(video_id, HEYGEN_API_KEY):
+    response = get_http_session("heygen").get(
+        HEYGEN_STATUS_ENDPOINT,
+        headers=heygen_headers(HEYGEN_API_KEY),
+        params={"video_id": video_id},
+        endpoint="GET video_status.get"
+    )
+    data = response.json().get("data") or {}
+    return data.get("status"), data.get("video_url")
@@ -0,0 +1,115 @@
+# Shared pooled HTTP sessions with retries and per-endpoint latency metrics
+import logging
+import os
+import random
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# (connect, read) timeout in seconds
+DEFAULT_TIMEOUT = (5, float(os.getenv("HTTP_READ_TIMEOUT", "30")))
+DEFAULT_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "20"))
+DEFAULT_RETRIES = int(os.getenv("HTTP_RETRIES", "4"))
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+
+# Keep-alive session that retries 429/5xx with exponential backoff and jitter
+class HttpSession:
+    def __init__(self, pool_size=DEFAULT_POOL_SIZE, timeout=DEFAULT_TIMEOUT, retries=DEFAULT_RETRIES, backoff=0.5, max_backoff=30):
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    # Full jitter: a random delay up to the exponential backoff cap
+    def backoff_delay(self, attempt, response=None):
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                return min(float(retry_after), self.max_backoff)
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def _record(self, endpoint, seconds, error=False):
+        with self._lock:
+            stats = self._metrics.setdefault(endpoint, {"count": 0, "errors": 0, "total_seconds": 0.0, "max_seconds": 0.0})
+            stats["count"] += 1
+            stats["errors"] += int(error)
+            stats["total_seconds"] += seconds
+            stats["max_seconds"] = max(stats["max_seconds"], seconds)
+
+    # Function to send a request, endpoint is the label the latency is recorded under
+    def request(self, method, url, endpoint=None, **kwargs):
+        method = method.upper()
+        endpoint = endpoint or f"{method} {urlparse(url).netloc}{urlparse(url).path}"
+        kwargs.setdefault("timeout", self.timeout)
+        # A POST that reached the server may have been applied, so only retry it when it clearly wasn't
+        idempotent = method in IDEMPOTENT_METHODS
+
+        for attempt in range(self.retries + 1):
+            last_attempt = attempt == self.retries
+            start = time.monotonic()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except requests.exceptions.RequestException as e:
+                self._record(endpoint, time.monotonic() - start, error=True)
+                retryable = idempotent or isinstance(e, requests.exceptions.ConnectTimeout)
+                if last_attempt or not retryable:
+                    raise
+                delay = self.backoff_delay(attempt)
+                logging.warning(f"{endpoint} failed ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+                continue
+
+            failed = response.status_code in RETRY_STATUSES
+            self._record(endpoint, time.monotonic() - start, error=failed)
+            retryable = idempotent or response.status_code == 429
+            if failed and retryable and not last_attempt:
+                delay = self.backoff_delay(attempt, response)
+                logging.warning(f"{endpoint} returned {response.status_code}, retrying in {delay:.1f}s")
+                time.sleep(delay)
+                continue
+            return response
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    # Function to report count, error count and average/max latency per endpoint
+    def metrics(self):
+        with self._lock:
+            return {
+                endpoint: dict(stats, avg_seconds=stats["total_seconds"] / stats["count"])
+                for endpoint, stats in self._metrics.items()
+            }
+
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+# Function to get the process-wide session for a service, created on first use
+def get_http_session(name="default", **kwargs):
+    with _sessions_lock:
+        if name not in _sessions:
+            _sessions[name] = HttpSession(**kwargs)
+        return _sessions[name]
+
+
+# Function to collect latency metrics from every shared session
+def http_metrics():
+    with _sessions_lock:
+        sessions = dict(_sessions)
+    return {name: session.metrics() for name, session in sessions.items()}
@@ -1,14 +1,108 @@
 import os
+import random
+import time
+import requests
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
-from googleapiclient.http import MediaFileUpload
+from googleapiclient.http import MediaFileUpload, MediaUpload
+from clients.http import get_http_session
+
+# Resumable upload chunk size, must be a multiple of 256 KiB
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+DOWNLOAD_BLOCK_SIZE = 256 * 1024
+
+# How many times an interrupted upload is resumed before giving up
+MAX_UPLOAD_RESUMES = 10
+RETRIABLE_STATUS_CODES = {500, 502, 503, 504}
+
+
+# Streams a remote video into a resumable upload through a bounded buffer.
+# Only the bytes from the last acknowledged offset up to the current chunk are held in memory.
+class RemoteMediaUpload(MediaUpload):
+    def __init__(self, url, mimetype="video/*", chunksize=UPLOAD_CHUNK_SIZE):
+        super().__init__()
+        self._url = url
+        self._mimetype = mimetype
+        self._chunksize = chunksize
+        self._http = get_http_session("video-download")
+        self._buffer = bytearray()
+        self._buffer_start = 0
+        self._size = None
+        self._blocks = None
+        self._open(0)
+
+    # Function to (re)open the download at an offset, using a Range request after the first byte
+    def _open(self, offset):
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+        response = self._http.get(self._url, headers=headers, stream=True, endpoint="GET video source")
+        response.raise_for_status()
+        if offset == 0 and response.headers.get("Content-Length"):
+            self._size = int(response.headers["Content-Length"])
+        self._blocks = response.iter_content(chunk_size=DOWNLOAD_BLOCK_SIZE)
+        if offset and response.status_code != 206:
+            # The server ignored the Range header, skip ahead to where we were
+            skipped = 0
+            while skipped < offset:
+                block = next(self._blocks, b"")
+                if not block:
+                    break
+                skipped += len(block)
+            if skipped > offset:
+                self._buffer.extend(block[len(block) - (skipped - offset):])
+
+    def _read_block(self):
+        end = self._buffer_start + len(self._buffer)
+        for attempt in range(MAX_UPLOAD_RESUMES):
+            try:
+                return next(self._blocks, b"")
+            except (requests.exceptions.RequestException, OSError):
+                time.sleep(random.uniform(0, min(30, 2 ** attempt)))
+                self._open(end)
+        return next(self._blocks, b"")
+
+    def chunksize(self):
+        return self._chunksize
+
+    def mimetype(self):
+        return self._mimetype
+
+    def size(self):
+        return self._size
+
+    def resumable(self):
+        return True
+
+    def has_stream(self):
+        return False
+
+    # Function to hand the uploader bytes [begin, begin + length), reading ahead only as far as needed
+    def getbytes(self, begin, length):
+        if begin < self._buffer_start:
+            # The server acknowledged less than we dropped, start the download over from there
+            self._buffer = bytearray()
+            self._buffer_start = begin
+            self._open(begin)
+        # Everything before begin has been acknowledged by YouTube, drop it
+        del self._buffer[:begin - self._buffer_start]
+        self._buffer_start = begin
+        while len(self._buffer) < length:
+            block = self._read_block()
+            if not block:
+                break
+            self._buffer.extend(block)
+        return bytes(self._buffer[:length])
+
+    def to_json(self):
+        raise NotImplementedError("Remote uploads can't be serialized")
 
 class YoutubeClient:
     def __init__(self, api_key):
         self.api_key = api_key
         self.youtube = None
+        # Set once videos.insert has gone out, from then on the upload has cost quota
+        self.insert_sent = False
 
     def authenticate(self):
         self.youtube = build('youtube', 'v3', developerKey=self.api_key)
@@ -27,16 +121,36 @@ class YoutubeClient:
             )
         )
 
+        # Remote videos are streamed straight through, local files are sent in chunks
+        if video_file_path.startswith(("http://", "https://")):
+            media_body = RemoteMediaUpload(video_file_path)
+        else:
+            media_body = MediaFileUpload(video_file_path, chunksize=UPLOAD_CHUNK_SIZE, resumable=True)
+
         # Call the API's videos.insert method to create and upload the video
         insert_request = self.youtube.videos().insert(
             part=','.join(body.keys()),
             body=body,
-            media_body=MediaFileUpload(video_file_path, chunksize=-1, resumable=True)
+            media_body=media_body
         )
 
         response = None
+        resumes = 0
+        self.insert_sent = True
         while response is None:
-            status, response = insert_request.next_chunk()
+            try:
+                status, response = insert_request.next_chunk(num_retries=3)
+            except (HttpError, OSError) as e:
+                if isinstance(e, HttpError) and e.resp.status not in RETRIABLE_STATUS_CODES:
+                    raise
+                resumes += 1
+                if resumes > MAX_UPLOAD_RESUMES:
+                    raise
+                # The next call asks YouTube for the last acknowledged byte and resumes from there
+                delay = random.uniform(0, min(60, 2 ** resumes))
+                print(f"Upload interrupted ({e}), resuming in {delay:.1f}s")
+                time.sleep(delay)
+                continue
             if status:
                 print("Uploaded %d%%." % int(status.progress() * 100))
 
@@ -1,50 +1,27 @@
-from app.custom_flask import Flask, request, jsonify
-import stripe
+from flask import Flask, request, jsonify
 import os
-import mysql.connector
-from mysql.connector import Error
-from urllib.parse import urlparse
 import hashlib  
+from app.db import db_connection, get_pool, DatabaseError
+from app.job_store import RenderJobStore, engine_for_slug, verify_callback_token
 
 app = Flask(__name__)
-stripe.api_key = os.getenv("STRIPE_SECRET_KEY")
+render_job_store = RenderJobStore()
 
 
-def hash_password(password):
-    return hashlib.sha256(password.encode()).hexdigest()
+# Stripe is only needed by the payment webhook, so it's imported on the first payment event
+def stripe_api():
+    import stripe
+    stripe.api_key = os.getenv("STRIPE_SECRET_KEY")
+    return stripe
 
 
-def create_connection():
-    try:
-        jawsdb_url = os.getenv("JAWSDB_URL")
-        if not jawsdb_url:
-            print("JawsDB URL not found in environment variables.")
-            return None
-
-        parsed_url = urlparse(jawsdb_url)
-        username = parsed_url.username
-        password = parsed_url.password
-        hostname = parsed_url.hostname
-        port = parsed_url.port
-        database = parsed_url.path.lstrip('/')
-
-        connection = mysql.connector.connect(
-            host=hostname,
-            port=port,
-            user=username,
-            password=password,
-            database=database
-        )
-        return connection
-    except Error as e:
-        print(f"Error connecting to JawsDB MySQL: {e}")
-        return None
+def hash_password(password):
+    return hashlib.sha256(password.encode()).hexdigest()
 
 
 def register_user(username, password, stripe_customer_id=None):
-    connection = create_connection()
-    if connection:
-        try:
+    try:
+        with db_connection() as connection:
             cursor = connection.cursor()
             query = """
                 INSERT INTO users (username, password, stripe_customer_id)
@@ -53,18 +30,27 @@ def register_user(username, password, stripe_customer_id=None):
             cursor.execute(query, (username, hash_password(password), stripe_customer_id))
             connection.commit()
             cursor.close()
-            connection.close()
             return True
-        except Error as e:
-            print(f"Error registering user: {e}")
+    except DatabaseError as e:
+        print(f"Error registering user: {e}")
     return False
 
 
+# Pool size, checkouts and how long requests waited for a connection
+@app.route("/metrics/db", methods=["GET"])
+def db_metrics():
+    try:
+        return jsonify(get_pool().metrics()), 200
+    except DatabaseError as e:
+        return jsonify({"error": str(e)}), 503
+
+
 @app.route("/webhook", methods=["POST"])
 def webhook():
     payload = request.data
     sig_header = request.headers.get("Stripe-Signature")
     event = None
+    stripe = stripe_api()
 
     try:
         event = stripe.Webhook.construct_event(
@@ -89,5 +75,39 @@ def webhook():
     return jsonify({"success": True}), 200
 
 
+# Parse a completion callback into (job_id, status, result_url, error)
+def parse_render_callback(engine, payload):
+    if engine == "D-ID":
+        # D-ID posts the talk object itself
+        error = payload.get("error")
+        return payload.get("id"), payload.get("status"), payload.get("result_url"), str(error) if error else None
+    # HeyGen wraps the video in an event
+    event_type = payload.get("event_type", "")
+    data = payload.get("event_data") or {}
+    if event_type.endswith("success"):
+        return data.get("video_id"), "done", data.get("url"), None
+    if event_type.endswith("fail"):
+        return data.get("video_id"), "error", None, data.get("msg")
+    return data.get("video_id"), None, None, None
+
+
+@app.route("/render-callback/<engine_slug>", methods=["POST"])
+def render_callback(engine_slug):
+    engine = engine_for_slug(engine_slug)
+    if engine is None:
+        return jsonify({"error": "Unknown engine"}), 404
+    if not verify_callback_token(request.args.get("token")):
+        return jsonify({"error": "Invalid token"}), 403
+
+    job_id, status, result_url, error = parse_render_callback(engine, request.get_json(silent=True) or {})
+    if not job_id or not status:
+        return jsonify({"success": True, "ignored": True}), 200
+
+    render_job_store.update(engine, job_id, status, result_url, error)
+    print(f"{engine} render {job_id} reported {status}")
+    return jsonify({"success": True}), 200
+
+
 if __name__ == "__main__":
-    app.run(port=4242)
+    # Video engines call /render-callback from outside, so listen on every interface and the platform's port
+    app.run(host="0.0.0.0", port=int(os.getenv("PORT", "4242")))
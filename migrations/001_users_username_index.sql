@@ -0,0 +1,6 @@
+-- Index the column logins look users up by (app/auth.py verify_credentials).
+-- Run once against the JawsDB database: mysql <database> < migrations/001_users_username_index.sql
+--
+-- Written for a VARCHAR username column. A TEXT column can only be indexed on a prefix,
+-- e.g. (username(191)), so adjust the statement if that's what the table uses.
+CREATE INDEX users_by_username ON users (username);
@@ -0,0 +1,21 @@
+-- Render jobs shared by the Streamlit app and the webhook service (app/job_store.py RenderJobStore).
+-- Run once against the JawsDB database: mysql <database> < migrations/002_render_jobs.sql
+--
+-- source_key is a content hash for uploaded files but the URL itself for remote sources, so it can be
+-- long: it's left out of the index and matched among the few rows sharing an engine and script hash.
+CREATE TABLE IF NOT EXISTS render_jobs (
+    engine VARCHAR(32) NOT NULL,
+    job_id VARCHAR(191) NOT NULL,
+    status VARCHAR(32) NOT NULL,
+    result_url TEXT,
+    error TEXT,
+    script MEDIUMTEXT,
+    script_hash CHAR(64),
+    source TEXT,
+    source_key TEXT,
+    created_at DOUBLE NOT NULL,
+    updated_at DOUBLE NOT NULL,
+    PRIMARY KEY (engine, job_id),
+    INDEX render_jobs_by_content (engine, script_hash),
+    INDEX render_jobs_by_status (status)
+);
@@ -0,0 +1,18 @@
+-- Scheduled posts shared by the schedule page and the scheduler workers (app/schedule_store.py ScheduleStore).
+-- Run once against the JawsDB database: mysql <database> < migrations/003_scheduled_posts.sql
+CREATE TABLE IF NOT EXISTS scheduled_posts (
+    id CHAR(32) NOT NULL PRIMARY KEY,
+    topic TEXT NOT NULL,
+    due_at DOUBLE NOT NULL,
+    settings TEXT NOT NULL,
+    status VARCHAR(16) NOT NULL,
+    error TEXT,
+    claimed_by VARCHAR(255),
+    lease_until DOUBLE,
+    attempts INT NOT NULL DEFAULT 0,
+    created_at DOUBLE NOT NULL,
+    updated_at DOUBLE NOT NULL,
+    INDEX scheduled_posts_by_due (status, due_at),
+    INDEX scheduled_posts_by_lease (status, lease_until),
+    INDEX scheduled_posts_by_update (updated_at)
+);
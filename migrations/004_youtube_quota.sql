@@ -0,0 +1,8 @@
+-- YouTube Data API quota spent per credential and quota day (app/publish_queue.py QuotaTracker).
+-- Run once against the JawsDB database: mysql <database> < migrations/004_youtube_quota.sql
+CREATE TABLE IF NOT EXISTS youtube_quota (
+    credential VARCHAR(191) NOT NULL,
+    day CHAR(10) NOT NULL,
+    used INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (credential, day)
+);
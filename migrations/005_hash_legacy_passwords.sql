@@ -0,0 +1,8 @@
+-- Replace passwords stored before hashing with their SHA-256 hex digest (app/auth.py hash_password),
+-- so logins never have to write to the users table.
+-- Run once against the JawsDB database: mysql <database> < migrations/005_hash_legacy_passwords.sql
+--
+-- Rows that already hold a 64-character hex digest are left alone.
+UPDATE users
+SET password = SHA2(password, 256)
+WHERE password IS NOT NULL AND password NOT REGEXP '^[0-9a-fA-F]{64}$';
@@ -14,14 +14,14 @@ st.write("Here you can adjust the settings for the app.")
 st.subheader("Trend Search Engine")
 st.session_state['trend_engine'] = st.selectbox(
     "Select Trend Search Engine",
-    ("X", "GPT")
+    ("X", "GPT", "All")
 )
 
 # Provide option to select Video Generation Engine
 st.subheader("Video Generation Engine")
 st.session_state['video_engine'] = st.selectbox(
     "Select Video Generation Engine",
-    ("D-ID", "Heygen")
+    ("D-ID", "Heygen", "Auto")
 )
 
 # Fetch API keys from environment variables, but hide them in the UI
@@ -0,0 +1,127 @@
+# Standalone worker that runs scheduled posts. Start as many processes as needed, on any machine that
+# can reach the app's MySQL database: each post is claimed under a lease by exactly one of them.
+import argparse
+import logging
+import multiprocessing
+import os
+import socket
+import threading
+import time
+
+from app.scheduler import Scheduler
+from app.schedule_store import ScheduleStore, DEFAULT_LEASE_SECONDS, SCHEDULED, RUNNING, DONE, FAILED
+
+logging.basicConfig(level=logging.INFO)
+
+# How often (seconds) a worker picks up posts added or changed by the app and other workers
+SYNC_INTERVAL = 5
+
+
+class ScheduleWorker:
+    def __init__(self, store, threads=2, lease_seconds=DEFAULT_LEASE_SECONDS):
+        self.store = store
+        self.lease_seconds = lease_seconds
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.scheduler = Scheduler(self._fire, max_workers=threads)
+        self.synced_at = 0.0
+
+    # Function to put a post in the local heap at the time it next needs looking at
+    def _track(self, post):
+        if post["status"] == SCHEDULED:
+            self.scheduler.add(post["id"], post["due_at"])
+        elif post["status"] == RUNNING and post["lease_until"]:
+            # Another worker has it, check back in case its lease runs out
+            self.scheduler.add(post["id"], post["lease_until"])
+        else:
+            self.scheduler.remove(post["id"])
+
+    def load(self):
+        self.synced_at = time.time()
+        for post in self.store.upcoming() + self.store.leased():
+            self._track(post)
+
+    def sync(self):
+        started = time.time()
+        # Overlap the window a little so a write that landed mid-query isn't missed.
+        # Deleted posts simply fail to claim when their time comes.
+        for post in self.store.changed_since(self.synced_at - 1):
+            self._track(post)
+        self.synced_at = started
+
+    def _fire(self, post_id, payload):
+        claimed = self.store.claim(self.worker_id, post_ids=[post_id], lease_seconds=self.lease_seconds)
+        if not claimed:
+            post = self.store.get(post_id)
+            if post and post["status"] in (SCHEDULED, RUNNING):
+                # Not ours yet: a clock a little behind, or a lease that was renewed
+                post = dict(post, due_at=max(post["due_at"], time.time() + 1))
+                if post["lease_until"]:
+                    post["lease_until"] = max(post["lease_until"], time.time() + 1)
+                self._track(post)
+            return
+        self._run(claimed[0])
+
+    def _run(self, post):
+        # Imported here so the workflow's SDKs load in the worker, not the parent process
+        from workflow import automatic_workflow
+
+        done = threading.Event()
+
+        def heartbeat():
+            while not done.wait(self.lease_seconds / 3):
+                if not self.store.renew(post["id"], self.worker_id, self.lease_seconds):
+                    logging.warning(f"Lost the lease on scheduled post {post['id']}")
+                    return
+
+        threading.Thread(target=heartbeat, daemon=True).start()
+        logging.info(f"{self.worker_id} running scheduled post {post['id']}: {post['topic']} (attempt {post['attempts']})")
+        try:
+            automatic_workflow(post["topic"], dict(post["settings"] or {"trend_engine": "GPT"}))
+        except Exception as e:
+            logging.exception(f"Scheduled post {post['id']} failed")
+            self.store.finish(post["id"], self.worker_id, FAILED, error=str(e))
+        else:
+            self.store.finish(post["id"], self.worker_id, DONE)
+        finally:
+            done.set()
+
+    def run_forever(self):
+        self.load()
+        self.scheduler.start()
+        logging.info(f"Scheduler worker {self.worker_id} started")
+        while True:
+            time.sleep(SYNC_INTERVAL)
+            try:
+                self.sync()
+            except Exception:
+                logging.exception("Failed to sync the schedule")
+
+
+def run_worker(threads, lease_seconds):
+    ScheduleWorker(ScheduleStore(), threads, lease_seconds).run_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run scheduled posts from the shared schedule database.")
+    parser.add_argument("--processes", type=int, default=int(os.getenv("SCHEDULER_PROCESSES", "1")))
+    parser.add_argument("--threads", type=int, default=int(os.getenv("SCHEDULER_THREADS", "2")), help="posts each process runs at once")
+    parser.add_argument("--lease", type=int, default=DEFAULT_LEASE_SECONDS, help="lease length in seconds")
+    args = parser.parse_args()
+
+    # Import scheduled_posts.json before the workers race for it
+    ScheduleStore()
+    if args.processes == 1:
+        run_worker(args.threads, args.lease)
+        return
+    workers = [
+        multiprocessing.Process(target=run_worker, args=(args.threads, args.lease), daemon=True)
+        for _ in range(args.processes)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,82 @@
+import copy
 import logging
-from app.get_trends import get_trends
+import threading
+from app.get_trends import cached_search_trends
 from app.create_video_script import create_video_script
-from app.generate_video import generate_video
-from app.upload_video import upload_video
+from app.generate_video import get_video_router
+from app.publish_queue import get_publish_queue, FAILED
+from app.job_store import source_key
+from app.pipeline import Pipeline, Stage
 
 logging.basicConfig(level=logging.INFO)
 
-def automatic_workflow(query, session_state):
+# Trend results go stale, so a rerun more than this long after (seconds) looks again
+TRENDS_MAX_AGE = 6 * 60 * 60
+
+def find_trend(context):
+    trends = cached_search_trends(context['query'], context['settings']['trend_engine'])
+    if not trends:
+        raise RuntimeError(f"No trends found for: {context['query']}")
+    logging.info(f'Selected trend: {trends[0]}')
+    return trends[0]
+
+def write_script(context):
+    script = create_video_script(context['trends'])
+    if not script:
+        raise RuntimeError(f"No script created for: {context['trends']}")
+    logging.info('Created video script')
+    return script
+
+def render_video(context):
+    video_url = get_video_router().render(context['script'], context['settings']['last_uploaded_image'], context['settings']['video_engine'])
+    if not video_url:
+        raise RuntimeError("Failed to create video.")
+    logging.info('Generated video')
+    return video_url
+
+def publish_video(context):
+    settings = context['settings']
+    publish_queue = get_publish_queue()
+    job_id = publish_queue.submit(context['video'], "Generated Video", "This video was generated using AI.", settings.get('YOUTUBE_VIDEO_CATEGORY', 'People & Blogs'), ["AI", "Generated Video"])
+    job = publish_queue.wait(job_id)
+    if job['state'] == FAILED:
+        raise RuntimeError(f"Upload failed: {job['error']}")
+    logging.info('Uploaded video')
+    return job['response']
+
+# Every stage of the content pipeline, in order. Each one is keyed only by what its output depends on,
+# so a rerun redoes a stage only when its inputs changed.
+CONTENT_STAGES = [
+    Stage('trends', find_trend, lambda c: {'query': c['query'], 'engine': c['settings']['trend_engine']}, workers=4, max_age=TRENDS_MAX_AGE),
+    Stage('script', write_script, lambda c: {'trend': c['trends']}, workers=4),
+    Stage('video', render_video, lambda c: {'script': c['script'], 'source': source_key(c['settings']['last_uploaded_image']), 'engine': c['settings']['video_engine']}, workers=8),
+    Stage('upload', publish_video, lambda c: {'video_url': c['video']}, workers=4, retries=0),
+]
+
+# The automatic workflow stops at the script for now, video and upload aren't run unattended yet
+WORKFLOW_STAGES = ('trends', 'script')
+
+# Function to build a pipeline from the named stages, optionally giving every stage the same number of workers
+def build_pipeline(stages=WORKFLOW_STAGES, workers=None):
+    selected = []
+    for stage in CONTENT_STAGES:
+        if stage.name in stages:
+            stage = copy.copy(stage)
+            stage.workers = workers or stage.workers
+            selected.append(stage)
+    return Pipeline(selected)
+
+_pipelines = {}
+_pipelines_lock = threading.Lock()
+
+# Function to get the process-wide pipeline for a set of stages, shared so jobs overlap in its pools
+def content_pipeline(stages=WORKFLOW_STAGES):
+    with _pipelines_lock:
+        if stages not in _pipelines:
+            _pipelines[stages] = build_pipeline(stages)
+        return _pipelines[stages]
+
+def automatic_workflow(query, session_state, stages=WORKFLOW_STAGES):
     logging.info('Starting automatic workflow...')
     # Initialize trend_engine if it doesn't exist in session_state
     session_state['trend_engine'] = session_state.get('trend_engine', 'GPT')
@@ -17,14 +87,7 @@ def automatic_workflow(query, session_state):
     # Initialize last_uploaded_image if it doesn't exist in session_state
     session_state['last_uploaded_image'] = session_state.get('last_uploaded_image', '')
     logging.info(f'Set last_uploaded_image to {session_state["last_uploaded_image"]}')
-    trends = get_trends(query, session_state)
-    selected_trend = trends[0]
-    logging.info(f'Selected trend: {selected_trend}')
-    script = create_video_script(selected_trend)
-    logging.info('Created video script')
-    source_url = session_state.get('last_uploaded_image', '')
-    #video_url = generate_video(script, source_url)
-    #logging.info('Generated video')
-    #upload_video(video_url)
-    #logging.info('Uploaded video')
+    # Completed stages are picked up from their checkpoints, so a retry only redoes what failed
+    context = content_pipeline(tuple(stages)).run(query=query, settings=dict(session_state))
     logging.info('Finished automatic workflow')
+    return context